@@ -0,0 +1,321 @@
+"""Benchmarks for the optimizer, the fitness functions and the scoring path.
+
+    python benchmarks/bench.py                       # run everything, write benchmarks/results.json
+    python benchmarks/bench.py --quick --only pso/   # a fast subset
+    python benchmarks/bench.py --save-baseline       # store the results as benchmarks/baseline.json
+    python benchmarks/bench.py --baseline benchmarks/baseline.json   # flag regressions
+    python benchmarks/bench.py --plot img/runtime_fitness_functions.png
+    python benchmarks/bench.py --only topology/   # evaluations to reach a target per topology
+    python benchmarks/bench.py --only surrogate/  # true fitness calls with a surrogate and cache
+
+Every case is timed `--repeats` times from the same seed and reported by
+its median. Results are compared by case name, so a baseline written on
+one machine should only be compared against runs on the same machine.
+
+The topology cases measure search quality rather than speed: each run
+minimizes Rastrigin from its own seed and stops once the best value
+reaches TOPOLOGY_TARGET, reporting the fitness evaluations that took.
+The surrogate cases likewise report true fitness calls and the final
+best value, with and without an EvaluationCache and SurrogateModel. The
+'plain-budget' method stops a plain run once it has used as many fitness
+calls as the surrogate run, so quality is also compared at equal cost.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+sys.path.insert(0, os.path.join(ROOT, 'deprecated'))
+
+import numpy as np
+from algorithm import particle_swarm_optimization
+from stopping import StoppingCriteria
+from application import get_min_max_metrics, reward_function
+from main import compare_repos_to_optimal
+from metric_store import MetricStore
+from surrogate import EvaluationCache, SurrogateModel
+from ParticleSwarm import rastrigin
+from topology import TOPOLOGIES
+
+
+RESULTS_LOCATION = os.path.join(ROOT, 'benchmarks', 'results.json')
+BASELINE_LOCATION = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+
+TOPOLOGY_TARGET = 10.0
+
+FITNESS_FUNCTIONS = {
+    'reward_function': (reward_function, lambda dim: get_min_max_metrics()),
+    'rastrigin': (rastrigin, lambda dim: np.array([(-5.12, 5.12)] * dim)),
+}
+
+
+def optimizer_cases(quick):
+    """PSO across swarm sizes, dimensions and iteration counts for each fitness function"""
+    swarm_sizes = [10, 100, 1000] if quick else [10, 50, 100, 500, 1000, 5000]
+    iterations = [50] if quick else [50, 100, 200]
+    for fitness, (function, make_bounds) in FITNESS_FUNCTIONS.items():
+        dims = [9] if fitness == 'reward_function' else ([2, 10] if quick else [2, 10, 30])
+        for dim in dims:
+            bounds = make_bounds(dim)
+            for num_particles in swarm_sizes:
+                for max_iter in iterations:
+                    params = {'fitness': fitness, 'particles': num_particles, 'dim': dim, 'iterations': max_iter}
+                    def run(dim=dim, bounds=bounds, function=function, num_particles=num_particles, max_iter=max_iter):
+                        particle_swarm_optimization(dim, bounds, function, num_particles=num_particles, max_iter=max_iter)
+                    yield case_name('pso', params), params, run
+
+
+def evaluations_to_target(topology, dim, num_particles, max_iter, target, seed):
+    """Fitness evaluations a minimizing run needed to reach `target`, or None if it never did"""
+    reached = []
+    def callback(stats):
+        if stats.best_value <= target:
+            reached.append(stats.evaluations)
+            return True
+    bounds = FITNESS_FUNCTIONS['rastrigin'][1](dim)
+    particle_swarm_optimization(dim, bounds, rastrigin, num_particles=num_particles, max_iter=max_iter, seed=seed,
+                                mode='minimize', topology=topology, callbacks=[callback])
+    return reached[0] if reached else None
+
+
+def topology_results(quick, repeats, only=''):
+    """Median evaluations to reach TOPOLOGY_TARGET on Rastrigin for each topology"""
+    dim, num_particles = 10, 40
+    max_iter = 300 if quick else 1000
+    results = []
+    for topology in TOPOLOGIES:
+        params = {'fitness': 'rastrigin', 'dim': dim, 'particles': num_particles, 'topology': topology}
+        name = case_name('topology', params)
+        if only not in name:
+            continue
+        start = time.perf_counter()
+        runs = [evaluations_to_target(topology, dim, num_particles, max_iter, TOPOLOGY_TARGET, seed) for seed in range(repeats)]
+        successes = [evaluations for evaluations in runs if evaluations is not None]
+        results.append({
+            'name': name,
+            'params': dict(params, target=TOPOLOGY_TARGET, max_iterations=max_iter),
+            'evaluations_to_target': statistics.median(successes) if successes else None,
+            'success_rate': len(successes) / repeats,
+            'seconds': (time.perf_counter() - start) / repeats,
+            'repeats': repeats,
+        })
+        reached = f"{results[-1]['evaluations_to_target']:.0f} evaluations" if successes else 'target not reached'
+        print(f"{name}: {reached} ({len(successes)}/{repeats} runs reached {TOPOLOGY_TARGET})")
+    return results
+
+
+def surrogate_results(quick, repeats, only=''):
+    """True fitness calls and final best value for plain, cached and surrogate-assisted runs
+
+    'plain-budget' is a plain run limited to the surrogate run's median
+    fitness calls for the same objective.
+    """
+    num_particles = 40
+    max_iter = 100 if quick else 300
+    objectives = [('reward_function', 9, 'maximize'), ('rastrigin', 10, 'minimize')]
+    results = []
+    for fitness, dim, mode in objectives:
+        function, make_bounds = FITNESS_FUNCTIONS[fitness]
+        bounds = make_bounds(dim)
+        budget = None
+        for method in ('plain', 'cache', 'surrogate', 'plain-budget'):
+            params = {'fitness': fitness, 'dim': dim, 'particles': num_particles, 'method': method}
+            name = case_name('surrogate', params)
+            if only not in name or (method == 'plain-budget' and budget is None):
+                continue
+            calls, values = [], []
+            start = time.perf_counter()
+            for seed in range(repeats):
+                cached = method in ('cache', 'surrogate')
+                reward = EvaluationCache(function, bounds) if cached else function
+                surrogate = SurrogateModel(bounds) if method == 'surrogate' else None
+                stopping = StoppingCriteria(max_evaluations=budget) if method == 'plain-budget' else None
+                _, value, info = particle_swarm_optimization(dim, bounds, reward, num_particles=num_particles, max_iter=max_iter,
+                                                             seed=seed, mode=mode, surrogate=surrogate, stopping=stopping,
+                                                             return_info=True)
+                calls.append(reward.misses if cached else info['evaluations'])
+                values.append(value)
+            results.append({
+                'name': name,
+                'params': dict(params, iterations=max_iter, mode=mode),
+                'fitness_calls': statistics.median(calls),
+                'best_value': float(statistics.median(values)),
+                'seconds': (time.perf_counter() - start) / repeats,
+                'repeats': repeats,
+            })
+            if method == 'surrogate':
+                budget = results[-1]['fitness_calls']
+            print(f"{name}: {results[-1]['fitness_calls']:.0f} fitness calls, best value {results[-1]['best_value']:.4g}")
+    return results
+
+
+def synthetic_metrics(rows, seed=0):
+    """Heavy-tailed integer metrics inside get_min_max_metrics(), like real repositories"""
+    bounds = get_min_max_metrics()
+    rng = np.random.default_rng(seed)
+    scale = rng.pareto(1.5, (rows, len(bounds))) * 0.02
+    return np.minimum(scale, 1.0) * (bounds[:, 1] - bounds[:, 0]) + bounds[:, 0]
+
+
+def synthetic_records(rows, seed=0):
+    metrics = ['commits', 'contributors', 'open_pr', 'closed_pr',
+               'merged_pr', 'open_issue', 'closed_issue', 'stars', 'fork']
+    for i, row in enumerate(synthetic_metrics(rows, seed).astype(int).tolist()):
+        record = dict(zip(metrics, row))
+        record.update(name=f'repo{i}', full_name=f'owner{i}/repo{i}', language='Python')
+        yield record
+
+
+def scoring_cases(quick, workdir, only=''):
+    """compare_repos_to_optimal on synthetic datasets, from records and from a metric store"""
+    sizes = [20, 1000, 100000] if quick else [20, 1000, 10000, 100000, 1000000]
+    bounds = get_min_max_metrics()
+    optimal = bounds[:, 1] * 0.5
+    for rows in sizes:
+        if not any(only in case_name('scoring', {'source': source, 'rows': rows}) for source in ('records', 'store')):
+            continue
+        records = list(synthetic_records(rows))
+        store = MetricStore.build(records, os.path.join(workdir, f'{rows}.store'))
+        for source, repos in [('records', records), ('store', store)]:
+            params = {'source': source, 'rows': rows}
+            def run(repos=repos):
+                compare_repos_to_optimal(repos, optimal, bounds, k=10)
+            yield case_name('scoring', params), params, run
+
+
+def case_name(group, params):
+    return group + '/' + '/'.join(f'{key}={value}' for key, value in params.items())
+
+
+def time_case(run, repeats, seed=0):
+    timings = []
+    for _ in range(repeats):
+        np.random.seed(seed)
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def run_benchmarks(cases, repeats):
+    results = []
+    for name, params, run in cases:
+        timings = time_case(run, repeats)
+        results.append({
+            'name': name,
+            'params': params,
+            'seconds': statistics.median(timings),
+            'min_seconds': min(timings),
+            'repeats': repeats,
+        })
+        print(f"{name}: {results[-1]['seconds'] * 1000:.2f} ms")
+    return results
+
+
+def compare_to_baseline(results, baseline, tolerance, min_seconds=0.005):
+    """Return the cases that got slower than the baseline by more than `tolerance`
+
+    Cases faster than `min_seconds` in the baseline are too noisy to judge
+    and are skipped.
+    """
+    previous = {result['name']: result for result in baseline['results']}
+    regressions = []
+    for result in results:
+        before = previous.get(result['name'])
+        if before is None or before['seconds'] < min_seconds:
+            continue
+        ratio = result['seconds'] / before['seconds'] if before['seconds'] > 0 else float('inf')
+        if ratio > 1 + tolerance:
+            regressions.append({'name': result['name'], 'baseline': before['seconds'], 'seconds': result['seconds'], 'ratio': ratio})
+    return regressions
+
+
+def plot_runtime(results, path):
+    """Runtime against swarm size for each fitness function, from the pso cases"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(8, 5))
+    series = {}
+    for result in results:
+        params = result['params']
+        if not result['name'].startswith('pso/'):
+            continue
+        label = f"{params['fitness']} (dim={params['dim']}, iterations={params['iterations']})"
+        series.setdefault(label, []).append((params['particles'], result['seconds']))
+    for label, points in sorted(series.items()):
+        points.sort()
+        ax.plot([p[0] for p in points], [p[1] for p in points], marker='o', label=label)
+    ax.set_xscale('log')
+    ax.set_yscale('log')
+    ax.set_xlabel('Number of particles')
+    ax.set_ylabel('Runtime (s)')
+    ax.set_title('PSO runtime by fitness function')
+    ax.legend(fontsize='small')
+    fig.tight_layout()
+    fig.savefig(path, dpi=120)
+    plt.close(fig)
+    print(f"Plot saved to {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the optimizer and scoring pipeline')
+    parser.add_argument('--quick', action='store_true', help='Run a reduced set of sizes')
+    parser.add_argument('--only', type=str, default='', help='Only run cases whose name contains this text')
+    parser.add_argument('--repeats', type=int, default=3, help='Timed runs per case (default: 3)')
+    parser.add_argument('--output', type=str, default=RESULTS_LOCATION, help='Where to write the results JSON')
+    parser.add_argument('--baseline', type=str, help='Baseline results JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed slowdown against the baseline (default: 0.25)')
+    parser.add_argument('--save-baseline', action='store_true', help=f'Also write the results to {BASELINE_LOCATION}')
+    parser.add_argument('--plot', type=str, help='Regenerate the runtime plot at this path')
+
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        cases = [case for group in (optimizer_cases(args.quick), scoring_cases(args.quick, workdir, args.only))
+                 for case in group if args.only in case[0]]
+        results = run_benchmarks(cases, args.repeats)
+    results += topology_results(args.quick, args.repeats, args.only)
+    results += surrogate_results(args.quick, args.repeats, args.only)
+
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'processor': platform.processor(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'quick': args.quick,
+        },
+        'results': results,
+    }
+    outputs = [args.output] + ([BASELINE_LOCATION] if args.save_baseline else [])
+    for path in outputs:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results saved to {path}")
+
+    if args.plot:
+        plot_runtime(results, args.plot)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression['name']}: {regression['baseline'] * 1000:.2f} ms -> "
+                  f"{regression['seconds'] * 1000:.2f} ms ({regression['ratio']:.2f}x)")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
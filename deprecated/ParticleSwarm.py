@@ -41,8 +41,9 @@ def particle_swarm_optimization(dim, bounds, num_particles=30, max_iter=100, w=0
     return global_best_position, rastrigin(global_best_position)
 
 # Example usage:
-dim = 2
-bounds = [(-5.12, 5.12), (-5.12, 5.12)]  # Rastrigin function domain
-best_pos, best_val = particle_swarm_optimization(dim, bounds)
-print("Best Position:", best_pos)
-print("Best Value:", best_val)
+if __name__ == "__main__":
+    dim = 2
+    bounds = [(-5.12, 5.12), (-5.12, 5.12)]  # Rastrigin function domain
+    best_pos, best_val = particle_swarm_optimization(dim, bounds)
+    print("Best Position:", best_pos)
+    print("Best Value:", best_val)
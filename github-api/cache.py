@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+import threading
+import requests
+from requests.structures import CaseInsensitiveDict
+
+
+CACHED_HEADERS = ('Link', 'ETag', 'Last-Modified', 'Content-Type')
+
+class ResponseCache:
+    """On-disk cache of GitHub API responses, revalidated with ETag/Last-Modified.
+
+    Entries are keyed by URL and query params, one JSON file per entry. A
+    conditional request answered with 304 is served from disk; GitHub does
+    not count those against the rate limit. When the cache grows past
+    `max_bytes`, the least recently used entries are evicted.
+    """
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._sizes = {}
+        for name in os.listdir(directory):
+            if name.endswith('.json'):
+                self._sizes[name] = os.path.getsize(os.path.join(directory, name))
+        self._total = sum(self._sizes.values())
+
+    def key(self, url, params=None):
+        canonical = json.dumps([url, sorted((params or {}).items())], default=str)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest() + '.json'
+
+    def lookup(self, url, params=None):
+        """Return the stored entry for this request, or None"""
+        path = os.path.join(self.directory, self.key(url, params))
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        os.utime(path)
+        return entry
+
+    def conditional_headers(self, entry):
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def store(self, url, params, response):
+        """Save a 200 response that carries a validator"""
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if response.status_code != 200 or not (etag or last_modified):
+            return
+        entry = {
+            'url': url,
+            'etag': etag,
+            'last_modified': last_modified,
+            'headers': {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers},
+            'body': response.content.decode('utf-8'),
+        }
+        name = self.key(url, params)
+        path = os.path.join(self.directory, name)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._total += os.path.getsize(path) - self._sizes.get(name, 0)
+            self._sizes[name] = os.path.getsize(path)
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        by_age = sorted(self._sizes, key=lambda name: self._mtime(name))
+        for name in by_age:
+            if self._total <= self.max_bytes * 0.9:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            self._total -= self._sizes.pop(name)
+            self.evictions += 1
+
+    def _mtime(self, name):
+        try:
+            return os.path.getmtime(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            return 0
+
+    def revalidated(self, entry, response):
+        """Build a 200 response from `entry` for a 304 `response`"""
+        cached = requests.Response()
+        cached.status_code = 200
+        cached.url = entry['url']
+        cached.encoding = 'utf-8'
+        cached.headers = CaseInsensitiveDict(entry['headers'])
+        for name, value in response.headers.items():
+            if name.lower().startswith('x-ratelimit'):
+                cached.headers[name] = value
+        cached._content = entry['body'].encode('utf-8')
+        with self._lock:
+            self.hits += 1
+            self.bytes_saved += len(cached._content)
+        return cached
+
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'bytes_saved': self.bytes_saved,
+            'evictions': self.evictions,
+            'entries': len(self._sizes),
+            'bytes': self._total,
+        }
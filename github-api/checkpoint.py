@@ -0,0 +1,54 @@
+import json
+import os
+import threading
+
+
+class CheckpointStore:
+    """Append-only JSONL log of finished repository records.
+
+    Every record is flushed and fsynced as soon as it is written, so a crashed
+    run loses at most the repository it was working on. On load the last
+    record per full_name wins and a torn final line (one without its
+    newline) is cut off the file, so the next append starts a fresh line.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.records = {}
+        self._lock = threading.Lock()
+        directory = os.path.dirname(filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.exists(filename):
+            complete = 0
+            with open(filename, 'rb') as f:
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break
+                    complete += len(line)
+                    try:
+                        record = json.loads(line.decode('utf-8'))
+                    except (UnicodeDecodeError, json.JSONDecodeError):
+                        continue
+                    self.records[record['full_name']] = record
+            if complete < os.path.getsize(filename):
+                with open(filename, 'r+b') as f:
+                    f.truncate(complete)
+                    os.fsync(f.fileno())
+
+    def is_current(self, repo):
+        """True if the stored record matches the search result's updated_at"""
+        record = self.records.get(repo['full_name'])
+        return record is not None and record.get('updated_at') == repo.get('updated_at')
+
+    def get(self, full_name):
+        return self.records.get(full_name)
+
+    def append(self, record):
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._lock:
+            with open(self.filename, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self.records[record['full_name']] = record
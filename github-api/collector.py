@@ -6,10 +6,56 @@ from datetime import datetime
 import os
 import argparse
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from scheduler import RateLimitScheduler
+from cache import ResponseCache
+from checkpoint import CheckpointStore
+
+API_URL = "https://api.github.com"
+
+rate_limiter = RateLimitScheduler()
+response_cache = None
+request_counts = {}
+_local = threading.local()
+
+def get_session(pool_size=10):
+    """Return this thread's keep-alive session, creating it on first use"""
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        _local.session = session
+    return session
+
+def api_request(method, url, params=None, headers=None, json=None):
+    """Send a GitHub API request through the shared rate-limit scheduler"""
+    while True:
+        rate_limiter.acquire()
+        response = get_session().request(method, url, params=params, headers=headers, json=json)
+        _local.requests = getattr(_local, 'requests', 0) + 1
+        if not rate_limiter.update(response):
+            return response
+
+def api_get(url, params=None, headers=None):
+    """GET a GitHub API URL through the shared rate-limit scheduler and response cache"""
+    entry = response_cache.lookup(url, params) if response_cache else None
+    if entry:
+        headers = dict(headers or {}, **response_cache.conditional_headers(entry))
+    response = api_request('GET', url, params=params, headers=headers)
+    if response_cache:
+        if entry and response.status_code == 304:
+            return response_cache.revalidated(entry, response)
+        response_cache.record_miss()
+        response_cache.store(url, params, response)
+    return response
 
 def fetch_top_repos(page=1, per_page=100):
     """Fetch top repositories sorted by stars from GitHub API"""
-    url = f"https://api.github.com/search/repositories"
+    url = f"{API_URL}/search/repositories"
     params = {
         "q": "stars:>1",
         "sort": "stars",
@@ -26,32 +72,15 @@ def fetch_top_repos(page=1, per_page=100):
     if 'GITHUB_TOKEN' in globals() and GITHUB_TOKEN:
         headers["Authorization"] = f"token {GITHUB_TOKEN}"
     
-    response = requests.get(url, params=params, headers=headers)
+    response = api_get(url, params=params, headers=headers)
     
     if response.status_code == 200:
         return response.json()
-    elif response.status_code == 403 and 'rate limit exceeded' in response.text:
-        reset_time = int(response.headers.get('X-RateLimit-Reset', 0))
-        current_time = int(time.time())
-        sleep_time = reset_time - current_time + 5
-        
-        print(f"Rate limit exceeded. Sleeping for {sleep_time} seconds.")
-        time.sleep(sleep_time)
-        return fetch_top_repos(page, per_page)
     else:
         print(f"Error: {response.status_code}")
         print(response.text)
         return None
 
-def handle_rate_limit(response):
-    """Handle GitHub API rate limiting"""
-    reset_time = int(response.headers.get('X-RateLimit-Reset', 0))
-    current_time = int(time.time())
-    sleep_time = reset_time - current_time + 5
-    
-    print(f"Rate limit exceeded. Sleeping for {sleep_time} seconds.")
-    time.sleep(sleep_time)
-
 def get_last_page_number(response):
     """Extract the last page number from the Link header"""
     try:
@@ -89,36 +118,30 @@ def get_last_page_number(response):
 
 def fetch_commit_count(repo_full_name, headers):
     """Fetch total commit count for a repository"""
-    url = f"https://api.github.com/repos/{repo_full_name}/commits"
+    url = f"{API_URL}/repos/{repo_full_name}/commits"
     params = {"per_page": 1}
     
-    response = requests.get(url, params=params, headers=headers)
+    response = api_get(url, params=params, headers=headers)
     
     if response.status_code == 200:
         last_page = get_last_page_number(response)
         # GitHub API paginates with 30 items per page by default when per_page is not specified
         # But we specified per_page=1, so each page has 1 commit
         return last_page
-    elif response.status_code == 403 and 'rate limit exceeded' in response.text:
-        handle_rate_limit(response)
-        return fetch_commit_count(repo_full_name, headers)
     else:
         print(f"Error fetching commit count for {repo_full_name}: {response.status_code}")
         return 0
 
 def fetch_contributors_count(repo_full_name, headers):
     """Fetch contributor count for a repository"""
-    url = f"https://api.github.com/repos/{repo_full_name}/contributors"
+    url = f"{API_URL}/repos/{repo_full_name}/contributors"
     params = {"per_page": 1}  # Removed anon=1 which was causing parsing issues
     
-    response = requests.get(url, params=params, headers=headers)
+    response = api_get(url, params=params, headers=headers)
     
     if response.status_code == 200:
         last_page = get_last_page_number(response)
         return last_page
-    elif response.status_code == 403 and 'rate limit exceeded' in response.text:
-        handle_rate_limit(response)
-        return fetch_contributors_count(repo_full_name, headers)
     else:
         print(f"Error fetching contributor count for {repo_full_name}: {response.status_code}")
         return 0
@@ -132,32 +155,29 @@ def fetch_pull_requests_counts(repo_full_name, headers):
     }
     
     # Fetch open PRs
-    url = f"https://api.github.com/repos/{repo_full_name}/pulls"
+    url = f"{API_URL}/repos/{repo_full_name}/pulls"
     params = {"state": "open", "per_page": 1}
     
-    response = requests.get(url, params=params, headers=headers)
+    response = api_get(url, params=params, headers=headers)
     
     if response.status_code == 200:
         counts["open_pr"] = get_last_page_number(response)
-    elif response.status_code == 403 and 'rate limit exceeded' in response.text:
-        handle_rate_limit(response)
-        return fetch_pull_requests_counts(repo_full_name, headers)
     
     # Fetch closed PRs
-    url = f"https://api.github.com/repos/{repo_full_name}/pulls"
+    url = f"{API_URL}/repos/{repo_full_name}/pulls"
     params = {"state": "closed", "per_page": 1}
     
-    response = requests.get(url, params=params, headers=headers)
+    response = api_get(url, params=params, headers=headers)
     
     if response.status_code == 200:
         counts["closed_pr"] = get_last_page_number(response)
     
     # Merged PRs requires individual checking, use sample to estimate
     # For large repos, get a reasonable estimation by sampling
-    url = f"https://api.github.com/repos/{repo_full_name}/pulls"
+    url = f"{API_URL}/repos/{repo_full_name}/pulls"
     params = {"state": "closed", "per_page": 20}  # Sample 20 closed PRs
     
-    response = requests.get(url, params=params, headers=headers)
+    response = api_get(url, params=params, headers=headers)
     
     if response.status_code == 200:
         closed_prs = response.json()
@@ -173,43 +193,45 @@ def fetch_pull_requests_counts(repo_full_name, headers):
         
     return counts
 
-def fetch_issues_counts(repo_full_name, headers):
-    """Fetch issue counts (open, closed) for a repository"""
+def fetch_issues_counts(repo_full_name, headers, pr_counts=None):
+    """Fetch issue counts (open, closed) for a repository
+
+    The REST issues endpoint also lists pull requests. With `pr_counts`
+    (from fetch_pull_requests_counts) they are subtracted, so the counts
+    are issues only, as the GraphQL backend reports them.
+    """
     counts = {
         "open_issue": 0,
         "closed_issue": 0
     }
     
     # Fetch open issues
-    url = f"https://api.github.com/repos/{repo_full_name}/issues"
+    url = f"{API_URL}/repos/{repo_full_name}/issues"
     params = {"state": "open", "per_page": 1}
     
-    response = requests.get(url, params=params, headers=headers)
+    response = api_get(url, params=params, headers=headers)
     
     if response.status_code == 200:
         counts["open_issue"] = get_last_page_number(response)
-    elif response.status_code == 403 and 'rate limit exceeded' in response.text:
-        handle_rate_limit(response)
-        return fetch_issues_counts(repo_full_name, headers)
     
     # Fetch closed issues
-    url = f"https://api.github.com/repos/{repo_full_name}/issues"
+    url = f"{API_URL}/repos/{repo_full_name}/issues"
     params = {"state": "closed", "per_page": 1}
     
-    response = requests.get(url, params=params, headers=headers)
+    response = api_get(url, params=params, headers=headers)
     
     if response.status_code == 200:
         counts["closed_issue"] = get_last_page_number(response)
     
+    if pr_counts is not None:
+        counts["open_issue"] = max(counts["open_issue"] - pr_counts["open_pr"], 0)
+        counts["closed_issue"] = max(counts["closed_issue"] - pr_counts["closed_pr"], 0)
+    
     return counts
 
-def collect_repo_metrics(repo, headers):
-    """Collect specific repository metrics"""
-    repo_full_name = repo["full_name"]
-    print(f"Collecting metrics for {repo_full_name}...")
-    
-    # Extract basic repo data
-    basic_data = {
+def basic_repo_data(repo):
+    """Extract the fields taken directly from a search result"""
+    return {
         "name": repo["name"],
         "full_name": repo["full_name"],
         "owner": repo["owner"]["login"],
@@ -220,6 +242,14 @@ def collect_repo_metrics(repo, headers):
         "created_at": repo["created_at"],
         "updated_at": repo["updated_at"]
     }
+
+def collect_repo_metrics(repo, headers):
+    """Collect specific repository metrics"""
+    repo_full_name = repo["full_name"]
+    print(f"Collecting metrics for {repo_full_name}...")
+    
+    # Extract basic repo data
+    basic_data = basic_repo_data(repo)
     
     # Get commit count
     basic_data["commits"] = fetch_commit_count(repo_full_name, headers)
@@ -232,11 +262,112 @@ def collect_repo_metrics(repo, headers):
     basic_data.update(pr_counts)
     
     # Get issue counts
-    issue_counts = fetch_issues_counts(repo_full_name, headers)
+    issue_counts = fetch_issues_counts(repo_full_name, headers, pr_counts)
     basic_data.update(issue_counts)
     
     return basic_data
 
+REPO_COUNTS_QUERY = """
+  r%(index)d: repository(owner: %(owner)s, name: %(name)s) {
+    defaultBranchRef { target { ... on Commit { history { totalCount } } } }
+    openPulls: pullRequests(states: OPEN) { totalCount }
+    closedPulls: pullRequests(states: CLOSED) { totalCount }
+    mergedPulls: pullRequests(states: MERGED) { totalCount }
+    openIssues: issues(states: OPEN) { totalCount }
+    closedIssues: issues(states: CLOSED) { totalCount }
+  }"""
+
+def build_counts_query(repos):
+    """Build one GraphQL query asking for the exact counts of every repository in `repos`"""
+    fields = []
+    for index, repo in enumerate(repos):
+        owner, name = repo["full_name"].split("/", 1)
+        fields.append(REPO_COUNTS_QUERY % {"index": index, "owner": json.dumps(owner), "name": json.dumps(name)})
+    return "query {" + "".join(fields) + "\n}"
+
+def counts_from_graphql(node):
+    """Map a repository node from build_counts_query to the dataset's count fields"""
+    target = (node.get("defaultBranchRef") or {}).get("target") or {}
+    merged = node["mergedPulls"]["totalCount"]
+    return {
+        "commits": (target.get("history") or {}).get("totalCount", 0),
+        # REST's state=closed includes merged pulls; GraphQL's CLOSED does not.
+        "closed_pr": node["closedPulls"]["totalCount"] + merged,
+        "open_pr": node["openPulls"]["totalCount"],
+        "merged_pr": merged,
+        # GraphQL issues exclude pull requests, as the REST backend's counts do
+        # once fetch_issues_counts subtracts them.
+        "open_issue": node["openIssues"]["totalCount"],
+        "closed_issue": node["closedIssues"]["totalCount"],
+    }
+
+def collect_batch_graphql(repos, headers, on_record=None):
+    """Collect metrics for a batch of repositories with one GraphQL query
+
+    Commit, pull request and issue counts come from exact totalCount fields;
+    contributors are not exposed by GraphQL and still take one REST call per
+    repository. Repositories missing from the GraphQL answer are collected
+    through the REST backend instead.
+    """
+    _local.requests = 0
+    response = api_request("POST", f"{API_URL}/graphql", headers=headers, json={"query": build_counts_query(repos)})
+    data = {}
+    if response.status_code == 200:
+        data = response.json().get("data") or {}
+    else:
+        print(f"Error: GraphQL batch failed with {response.status_code}")
+    shared_requests = _local.requests / len(repos)
+    
+    results = []
+    for index, repo in enumerate(repos):
+        node = data.get(f"r{index}")
+        if node is None:
+            repo_metrics = process_repo(repo, headers, index, len(repos), on_record)
+        else:
+            try:
+                _local.requests = 0
+                repo_metrics = basic_repo_data(repo)
+                repo_metrics["contributors"] = fetch_contributors_count(repo["full_name"], headers)
+                repo_metrics.update(counts_from_graphql(node))
+                request_counts[repo["full_name"]] = _local.requests + shared_requests
+                if on_record is not None:
+                    on_record(repo_metrics)
+                print(f"Successfully processed {repo['full_name']}")
+            except Exception as e:
+                print(f"Error processing repository {repo['full_name']}: {str(e)}")
+                repo_metrics = None
+        if repo_metrics is not None:
+            results.append(repo_metrics)
+    return results
+
+class JsonlWriter:
+    """Append repository records to a JSON Lines file as they are collected
+
+    With `atomic` (the default) records go to `filename` + '.partial', which
+    replaces `filename` on close, so readers of the dataset never see a run
+    in progress or one that crashed.
+    """
+
+    def __init__(self, filename, atomic=True):
+        directory = os.path.dirname(filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.filename = filename
+        self.path = f"{filename}.partial" if atomic else filename
+        self._file = open(self.path, 'w', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def append(self, record):
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+        if self.path != self.filename:
+            os.replace(self.path, self.filename)
+
 def save_to_json(data, filename='data/data.json'):
     """Save repositories data to JSON file"""
     directory = os.path.dirname(filename)
@@ -265,8 +396,53 @@ def save_to_csv(data, filename='data/data.csv'):
         writer.writerows(data)
     print(f"Data saved to {filename}")
 
-def collect_data(total_repos=20):
-    """Main function to collect repository metrics"""
+def process_repo(repo, headers, index, total, on_record=None):
+    """Collect metrics for one repository, returning None if it fails"""
+    try:
+        print(f"Processing repository {index+1}/{total}: {repo['full_name']}")
+        _local.requests = 0
+        repo_metrics = collect_repo_metrics(repo, headers)
+        request_counts[repo['full_name']] = _local.requests
+        if on_record is not None:
+            on_record(repo_metrics)
+        print(f"Successfully processed {repo['full_name']}")
+        return repo_metrics
+    except Exception as e:
+        print(f"Error processing repository {repo['full_name']}: {str(e)}")
+        return None
+
+def collect_graphql(repos, headers, workers, on_record=None, batch_size=20):
+    """Collect metrics in GraphQL batches of `batch_size`, `workers` batches at a time"""
+    batches = [repos[i:i + batch_size] for i in range(0, len(repos), batch_size)]
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        results = executor.map(lambda batch: collect_batch_graphql(batch, headers, on_record), batches)
+        return [repo_metrics for batch in results for repo_metrics in batch]
+
+def collect_concurrently(repos, headers, workers, on_record=None):
+    """Collect metrics for many repositories on a bounded thread pool.
+
+    Each worker thread keeps its own keep-alive session; all of them share
+    rate_limiter, so throttling applies to the pool as a whole. Results keep
+    the order of `repos`.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(
+            lambda item: process_repo(item[1], headers, item[0], len(repos), on_record),
+            enumerate(repos)
+        )
+        return [repo_metrics for repo_metrics in results if repo_metrics is not None]
+
+def collect_data(total_repos=20, workers=1, checkpoint_file=None, backend='rest', jsonl_file='data/data.jsonl'):
+    """Main function to collect repository metrics
+
+    With `checkpoint_file`, every finished repository is appended to that
+    JSONL file straight away, and repositories whose updated_at matches
+    their stored record are taken from it instead of being fetched again.
+    A crashed run can therefore be rerun and resumes where it stopped.
+    
+    `backend='graphql'` takes the counts from batched GraphQL queries rather
+    than one REST call per count (GitHub requires a token for GraphQL).
+    """
     start_time = time.time()
     
     print(f"Starting collection of top {total_repos} GitHub repositories...")
@@ -298,30 +474,54 @@ def collect_data(total_repos=20):
         
         if len(repos) < per_page:
             break
-            
-        time.sleep(2)
     
     all_repos = all_repos[:total_repos]
     
+    checkpoint = CheckpointStore(checkpoint_file) if checkpoint_file else None
+    stream = JsonlWriter(jsonl_file)
+    pending = all_repos
+    if checkpoint is not None:
+        pending = [repo for repo in all_repos if not checkpoint.is_current(repo)]
+        print(f"Reusing {len(all_repos) - len(pending)} unchanged repositories from {checkpoint_file}")
+        for repo in all_repos:
+            if checkpoint.is_current(repo):
+                stream.append(checkpoint.get(repo['full_name']))
+    
+    def on_record(record):
+        if checkpoint is not None:
+            checkpoint.append(record)
+        stream.append(record)
+    
     # Process each repository
-    processed_repos = []
-    for i, repo in enumerate(all_repos):
-        try:
-            print(f"Processing repository {i+1}/{len(all_repos)}: {repo['full_name']}")
-            repo_metrics = collect_repo_metrics(repo, headers)
-            processed_repos.append(repo_metrics)
-            print(f"Successfully processed {repo['full_name']}")
-            
-            # Be extra cautious with rate limits between repositories
-            time.sleep(2)
-        except Exception as e:
-            print(f"Error processing repository {repo['full_name']}: {str(e)}")
-            continue
+    if backend == 'graphql':
+        processed_repos = collect_graphql(pending, headers, workers, on_record)
+    elif workers > 1:
+        processed_repos = collect_concurrently(pending, headers, workers, on_record)
+    else:
+        processed_repos = []
+        for i, repo in enumerate(pending):
+            repo_metrics = process_repo(repo, headers, i, len(pending), on_record)
+            if repo_metrics is not None:
+                processed_repos.append(repo_metrics)
+    
+    stream.close()
+    print(f"Data saved to {jsonl_file}")
+    
+    if checkpoint is not None:
+        processed_repos = [checkpoint.get(repo['full_name']) for repo in all_repos if checkpoint.get(repo['full_name'])]
     
     # Save data in multiple formats
     save_to_json(processed_repos)
     save_to_csv(processed_repos)
     
+    collected = [request_counts[repo['full_name']] for repo in pending if repo['full_name'] in request_counts]
+    if collected:
+        print(f"API requests per repository: {sum(collected) / len(collected):.2f} average over {len(collected)} repositories")
+    
+    if response_cache:
+        stats = response_cache.stats()
+        print(f"Response cache: {stats['hits']} hits, {stats['misses']} misses, {stats['bytes_saved']} bytes saved")
+    
     elapsed_time = time.time() - start_time
     print(f"Collection complete: {len(processed_repos)}/{total_repos} repositories collected in {elapsed_time:.2f} seconds.")
     return processed_repos
@@ -330,10 +530,21 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Collect GitHub repository metrics for PSO analysis')
     parser.add_argument('--repos', type=int, default=20, help='Number of repositories to collect (default: 20)')
     parser.add_argument('--token', type=str, help='GitHub personal access token')
+    parser.add_argument('--workers', type=int, default=1, help='Number of repositories collected concurrently (default: 1)')
+    parser.add_argument('--backend', choices=['rest', 'graphql'], default='rest', help='How repository counts are collected (default: rest)')
+    parser.add_argument('--checkpoint', type=str, help='JSONL file to checkpoint finished repositories to and resume from')
+    parser.add_argument('--cache-dir', type=str, help='Directory for the on-disk response cache (disabled if omitted)')
+    parser.add_argument('--cache-size', type=int, default=256, help='Response cache size limit in MB (default: 256)')
+    parser.add_argument('--api-url', type=str, default=API_URL, help='GitHub API base URL (default: %(default)s)')
     
     args = parser.parse_args()
     
     if args.token:
         GITHUB_TOKEN = args.token
     
-    collect_data(total_repos=args.repos)
+    API_URL = args.api_url.rstrip('/')
+    
+    if args.cache_dir:
+        response_cache = ResponseCache(args.cache_dir, max_bytes=args.cache_size * 1024 * 1024)
+    
+    collect_data(total_repos=args.repos, workers=args.workers, checkpoint_file=args.checkpoint, backend=args.backend)
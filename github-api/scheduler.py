@@ -0,0 +1,79 @@
+import threading
+import time
+
+
+class RateLimitScheduler:
+    """Shared GitHub rate-limit budget for every worker of a collection run.
+
+    Workers call acquire() before each request and update() with each
+    response. The scheduler tracks X-RateLimit-Remaining/X-RateLimit-Reset and,
+    once the budget is spent, blocks all workers until the window resets.
+    A rate-limited response with no Retry-After and no future reset (a
+    secondary limit) blocks them for `backoff` seconds instead, doubling up
+    to `max_backoff` while the server keeps refusing.
+    """
+
+    def __init__(self, clock=time.time, margin=5, backoff=60, max_backoff=3600):
+        self.clock = clock
+        self.margin = margin
+        self.min_backoff = backoff
+        self.max_backoff = max_backoff
+        self.backoff = backoff
+        self.remaining = None
+        self.reset_at = None
+        self.waits = 0
+        self._announced = None
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """Reserve one request from the budget, waiting for a reset if it is spent"""
+        with self._cond:
+            while self.remaining is not None and self.remaining <= 0:
+                delay = (self.reset_at or 0) + self.margin - self.clock()
+                if delay <= 0:
+                    self.remaining = None
+                    break
+                if self._announced != self.reset_at:
+                    self._announced = self.reset_at
+                    self.waits += 1
+                    print(f"Rate limit exceeded. Sleeping for {int(delay)} seconds.")
+                self._cond.wait(timeout=delay)
+            if self.remaining is not None:
+                self.remaining -= 1
+
+    def update(self, response):
+        """Record the budget reported by a response; return True if it was rate limited"""
+        headers = response.headers
+        limited = response.status_code in (403, 429) and (
+            headers.get('X-RateLimit-Remaining') == '0' or 'rate limit' in response.text.lower()
+        )
+        with self._cond:
+            try:
+                reset_at = int(headers['X-RateLimit-Reset'])
+                remaining = int(headers['X-RateLimit-Remaining'])
+            except (KeyError, ValueError):
+                reset_at, remaining = self.reset_at, self.remaining
+            now = int(self.clock())
+            if limited:
+                remaining = 0
+                if 'Retry-After' in headers:
+                    reset_at = now + int(headers['Retry-After'])
+                elif reset_at is None or reset_at <= now:
+                    if self.remaining == 0 and self.reset_at is not None and self.reset_at > now:
+                        # Another worker already started this backoff.
+                        reset_at = self.reset_at
+                    else:
+                        reset_at = now + self.backoff
+                        self.backoff = min(self.backoff * 2, self.max_backoff)
+            else:
+                self.backoff = self.min_backoff
+            if remaining is not None:
+                if reset_at != self.reset_at or self.remaining is None:
+                    # A new window: trust the server's count.
+                    self.remaining = remaining
+                else:
+                    # Same window: in-flight responses can report stale counts.
+                    self.remaining = min(self.remaining, remaining)
+                self.reset_at = reset_at
+            self._cond.notify_all()
+        return limited
@@ -0,0 +1,248 @@
+"""Sharded collection: one worker process per GitHub token, fed by a coordinator.
+
+The coordinator fetches the repository list once, then hands out small
+batches to whichever worker asks next. Each worker reports its token's
+remaining budget with every finished batch; a worker whose token cannot
+afford another batch is told to wait while tokens with budget left take the
+work, so a slow or spent token does not hold up the run. Workers write their
+records to their own shard file, and the shards are merged in search-rank
+order into the standard dataset files.
+
+    python github-api/stub_server.py --rate-limit 100 --window 60
+    python github-api/shards.py --api-url http://127.0.0.1:8000 --tokens a b c --repos 20
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from multiprocessing.connection import wait
+
+import collector
+from collector import JsonlWriter, save_to_csv, save_to_json
+from scheduler import RateLimitScheduler
+
+
+def token_headers(token):
+    headers = {
+        "Accept": "application/vnd.github+json",
+        "User-Agent": "GitHub-Repo-Metrics-Collector"
+    }
+    if token:
+        headers["Authorization"] = f"token {token}"
+    return headers
+
+def budget():
+    """This process's view of its token's budget: (remaining, reset_at)"""
+    return collector.rate_limiter.remaining, collector.rate_limiter.reset_at
+
+def shard_worker(conn, token, api_url, shard_file, backend, threads):
+    """Collect the batches sent over `conn` with one token and its own connection pool"""
+    collector.API_URL = api_url
+    # A forked worker inherits the parent's limiter, filled from tokens[0]'s
+    # responses; start from this token's own budget instead.
+    collector.rate_limiter = RateLimitScheduler()
+    collector.request_counts = {}
+    headers = token_headers(token)
+    # Written in place so a killed worker's records still reach the merge.
+    stream = JsonlWriter(shard_file, atomic=False)
+    try:
+        conn.send(('ready', budget()))
+        while True:
+            message = conn.recv()
+            if message[0] == 'stop':
+                break
+            if message[0] == 'wait':
+                time.sleep(message[1])
+                conn.send(('ready', budget()))
+                continue
+            repos = message[1]
+            if backend == 'graphql':
+                records = collector.collect_graphql(repos, headers, threads, stream.append)
+            else:
+                records = collector.collect_concurrently(repos, headers, threads, stream.append)
+            requests = sum(collector.request_counts.get(repo['full_name'], 0) for repo in repos)
+            conn.send(('done', [record['full_name'] for record in records], requests, budget()))
+    finally:
+        stream.close()
+        conn.close()
+
+
+class TokenBudget:
+    def __init__(self):
+        self.remaining = None
+        self.reset_at = None
+        self.requests = 0
+        self.repos = 0
+
+
+class ShardCoordinator:
+    """Hands out batches of repositories according to each token's remaining budget
+
+    A batch costs its size times the observed requests per repository
+    (`default_cost` until something has been collected). Work lost with a
+    crashed worker is put back in the queue.
+    """
+
+    def __init__(self, repos, num_tokens, batch_size=5, default_cost=8, clock=time.time):
+        self.repos = repos
+        self.batch_size = batch_size
+        self.default_cost = default_cost
+        self.clock = clock
+        self.pending = deque(range(len(repos)))
+        self.in_flight = {}
+        self.budgets = [TokenBudget() for _ in range(num_tokens)]
+
+    def cost(self):
+        requests = sum(budget.requests for budget in self.budgets)
+        repos = sum(budget.repos for budget in self.budgets)
+        return requests / repos if repos else self.default_cost
+
+    def affordable(self, shard):
+        budget = self.budgets[shard]
+        if budget.remaining is None or (budget.reset_at is not None and self.clock() >= budget.reset_at):
+            return self.batch_size
+        return int(budget.remaining // max(self.cost(), 1e-9))
+
+    def report(self, shard, remaining, reset_at, repos=0, requests=0):
+        budget = self.budgets[shard]
+        budget.remaining, budget.reset_at = remaining, reset_at
+        budget.repos += repos
+        budget.requests += requests
+        self.in_flight.pop(shard, None)
+
+    def fail(self, shard):
+        """Requeue the batch a dead worker was holding"""
+        self.pending.extendleft(reversed(self.in_flight.pop(shard, [])))
+
+    def assign(self, shard):
+        """Return ('batch', repos), ('wait', seconds) or None when the run is finished"""
+        if not self.pending:
+            return ('wait', 0.5) if self.in_flight else None
+        affordable = self.affordable(shard)
+        if affordable < 1:
+            others = [other for other in range(len(self.budgets)) if other != shard and self.affordable(other) >= 1]
+            if others:
+                reset_at = self.budgets[shard].reset_at
+                return ('wait', min(max(reset_at - self.clock(), 0.1), 1.0) if reset_at else 1.0)
+            # Every token is spent: the worker's own scheduler sleeps until its reset.
+            affordable = 1
+        batch = [self.pending.popleft() for _ in range(min(self.batch_size, affordable, len(self.pending)))]
+        self.in_flight[shard] = batch
+        return ('batch', [self.repos[index] for index in batch])
+
+
+def merge_shards(shard_files, repos):
+    """Merge shard outputs into one list in the order of `repos`
+
+    A repository found in more than one shard (collected again after its
+    worker died) is taken from the first shard file in sorted order.
+    """
+    records = {}
+    for shard_file in sorted(shard_files):
+        if not os.path.exists(shard_file):
+            continue
+        with open(shard_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    records.setdefault(record['full_name'], record)
+    return [records[repo['full_name']] for repo in repos if repo['full_name'] in records]
+
+def collect_sharded(tokens, total_repos=20, shard_dir='data/shards', backend='rest', threads=1, batch_size=5,
+                    jsonl_file='data/data.jsonl'):
+    """Collect the top `total_repos` repositories with one worker process per token"""
+    start_time = time.time()
+    collector.GITHUB_TOKEN = tokens[0]
+
+    repos = []
+    per_page = 100
+    for page in range(1, (total_repos + per_page - 1) // per_page + 1):
+        response_data = collector.fetch_top_repos(page, per_page)
+        if not response_data:
+            break
+        repos.extend(response_data.get('items', []))
+        if len(response_data.get('items', [])) < per_page:
+            break
+    repos = repos[:total_repos]
+    print(f"Sharding {len(repos)} repositories across {len(tokens)} tokens")
+
+    os.makedirs(shard_dir, exist_ok=True)
+    shard_files = [os.path.join(shard_dir, f"shard-{shard}.jsonl") for shard in range(len(tokens))]
+    coordinator = ShardCoordinator(repos, len(tokens), batch_size=batch_size,
+                                   default_cost=2 if backend == 'graphql' else 8)
+
+    ctx = multiprocessing.get_context()
+    connections, processes = {}, []
+    try:
+        for shard, token in enumerate(tokens):
+            parent_conn, child_conn = ctx.Pipe()
+            process = ctx.Process(
+                target=shard_worker,
+                args=(child_conn, token, collector.API_URL, shard_files[shard], backend, threads),
+                daemon=True,
+            )
+            process.start()
+            child_conn.close()
+            connections[parent_conn] = shard
+            processes.append(process)
+
+        while connections:
+            for conn in wait(list(connections)):
+                shard = connections[conn]
+                try:
+                    message = conn.recv()
+                except EOFError:
+                    print(f"Shard {shard} exited early; requeueing its batch")
+                    coordinator.fail(shard)
+                    del connections[conn]
+                    continue
+                if message[0] == 'done':
+                    _, collected, requests, (remaining, reset_at) = message
+                    coordinator.report(shard, remaining, reset_at, len(collected), requests)
+                else:
+                    coordinator.report(shard, *message[1])
+                assignment = coordinator.assign(shard)
+                if assignment is None:
+                    conn.send(('stop',))
+                    del connections[conn]
+                else:
+                    conn.send(assignment)
+    finally:
+        for process in processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+
+    records = merge_shards(shard_files, repos)
+    stream = JsonlWriter(jsonl_file)
+    for record in records:
+        stream.append(record)
+    stream.close()
+    print(f"Data saved to {jsonl_file}")
+    save_to_json(records)
+    save_to_csv(records)
+
+    for shard, budget in enumerate(coordinator.budgets):
+        print(f"Token {shard}: {budget.repos} repositories, {budget.requests:.0f} requests, {budget.remaining} remaining")
+    elapsed_time = time.time() - start_time
+    print(f"Collection complete: {len(records)}/{total_repos} repositories collected in {elapsed_time:.2f} seconds.")
+    return records
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Collect GitHub repository metrics with one worker process per token')
+    parser.add_argument('--tokens', nargs='+', required=True, help='GitHub personal access tokens, one worker each')
+    parser.add_argument('--repos', type=int, default=20, help='Number of repositories to collect (default: 20)')
+    parser.add_argument('--backend', choices=['rest', 'graphql'], default='rest', help='How repository counts are collected (default: rest)')
+    parser.add_argument('--threads', type=int, default=1, help='Concurrent repositories within each worker (default: 1)')
+    parser.add_argument('--batch-size', type=int, default=5, help='Repositories handed to a worker at a time (default: 5)')
+    parser.add_argument('--shard-dir', type=str, default='data/shards', help='Directory for per-token shard files (default: data/shards)')
+    parser.add_argument('--api-url', type=str, default=collector.API_URL, help='GitHub API base URL (default: %(default)s)')
+
+    args = parser.parse_args()
+
+    collector.API_URL = args.api_url.rstrip('/')
+
+    collect_sharded(args.tokens, total_repos=args.repos, shard_dir=args.shard_dir, backend=args.backend,
+                    threads=args.threads, batch_size=args.batch_size)
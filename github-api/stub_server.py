@@ -0,0 +1,225 @@
+"""Local stand-in for the parts of the GitHub REST API used by collector.py.
+
+It serves search results and Link-header pagination for commits,
+contributors, pulls and issues from a list of repository records (the
+collector's own output format), and sends X-RateLimit-* headers from a
+budget of its own so rate-limit handling can be exercised offline. Responses
+carry an ETag, and a matching If-None-Match gets a 304 that, as on GitHub,
+is not charged to the rate limit. POST /graphql answers the repository
+count queries built by collector.build_counts_query:
+
+    python github-api/stub_server.py --data data/data.json --port 8000
+    python github-api/collector.py --api-url http://127.0.0.1:8000 --workers 8
+"""
+import argparse
+import hashlib
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+COUNT_ENDPOINTS = {
+    'commits': lambda repo, state: repo.get('commits', 0),
+    'contributors': lambda repo, state: repo.get('contributors', 0),
+    'pulls': lambda repo, state: repo.get('closed_pr', 0) if state == 'closed' else repo.get('open_pr', 0),
+    # As on GitHub, the REST issues endpoint also lists pull requests.
+    'issues': lambda repo, state: (repo.get('closed_issue', 0) + repo.get('closed_pr', 0) if state == 'closed'
+                                   else repo.get('open_issue', 0) + repo.get('open_pr', 0)),
+}
+
+
+GRAPHQL_REPOSITORY = re.compile(r'(\w+): repository\(owner: ("(?:[^"\\]|\\.)*"), name: ("(?:[^"\\]|\\.)*")\)')
+
+
+class StubGitHub:
+    """State shared by all handler threads: repositories, rate budget and request log"""
+
+    def __init__(self, repos, rate_limit=5000, window=3600):
+        self.repos = sorted(repos, key=lambda repo: repo.get('stars', 0), reverse=True)
+        self.by_name = {repo['full_name']: repo for repo in self.repos}
+        self.rate_limit = rate_limit
+        self.window = window
+        self.requests = []
+        self._budgets = {}
+        self._lock = threading.Lock()
+
+    def consume(self, token, charge=True):
+        """Charge one request to `token`'s budget; return (remaining, reset, allowed)"""
+        with self._lock:
+            now = time.time()
+            remaining, reset_at = self._budgets.get(token, (self.rate_limit, int(now) + self.window))
+            if now >= reset_at:
+                remaining, reset_at = self.rate_limit, int(now) + self.window
+            allowed = remaining > 0
+            if allowed and charge:
+                remaining -= 1
+            self._budgets[token] = (remaining, reset_at)
+            return remaining, reset_at, allowed
+
+    def log(self, path, params):
+        with self._lock:
+            self.requests.append((path, params))
+
+    def search_item(self, repo):
+        owner = repo.get('owner') or repo['full_name'].split('/')[0]
+        return {
+            'name': repo['name'],
+            'full_name': repo['full_name'],
+            'owner': {'login': owner},
+            'description': repo.get('description'),
+            'language': repo.get('language'),
+            'stargazers_count': repo.get('stars', 0),
+            'forks_count': repo.get('fork', 0),
+            'created_at': repo.get('created_at'),
+            'updated_at': repo.get('updated_at'),
+        }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        self.server.stub.log(url.path, params)
+        self.respond(*self.route(url.path, params))
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b'{}')
+        self.server.stub.log(url.path, request)
+        if url.path.rstrip('/') != '/graphql':
+            return self.respond(404, {'message': 'Not Found'}, {})
+        self.respond(200, {'data': self.graphql(request.get('query', ''))}, {})
+
+    def respond(self, status, body, headers):
+        """Send `body`, charging the rate limit unless a conditional request matches"""
+        stub = self.server.stub
+        token = self.headers.get('Authorization', '').split(' ')[-1] or None
+        payload = json.dumps(body).encode('utf-8')
+        etag = '"' + hashlib.sha1(payload).hexdigest() + '"'
+        not_modified = status == 200 and self.headers.get('If-None-Match') == etag
+        remaining, reset_at, allowed = stub.consume(token, charge=not not_modified)
+        headers.update({
+            'X-RateLimit-Limit': str(stub.rate_limit),
+            'X-RateLimit-Remaining': str(remaining),
+            'X-RateLimit-Reset': str(reset_at),
+        })
+        if not_modified:
+            return self.send_payload(304, b'', dict(headers, ETag=etag))
+        if not allowed:
+            return self.send_payload(403, json.dumps({'message': 'API rate limit exceeded'}).encode('utf-8'), headers)
+        if status == 200:
+            headers['ETag'] = etag
+        self.send_payload(status, payload, headers)
+
+    def route(self, path, params):
+        """Return (status, body, headers) for a request"""
+        stub = self.server.stub
+        parts = path.strip('/').split('/')
+        if parts == ['search', 'repositories']:
+            return self.search(params)
+        if len(parts) == 4 and parts[0] == 'repos' and parts[3] in COUNT_ENDPOINTS:
+            repo = stub.by_name.get(f"{parts[1]}/{parts[2]}")
+            if repo is not None:
+                return self.paginated(repo, parts[3], params)
+        return 404, {'message': 'Not Found'}, {}
+
+    def graphql(self, query):
+        data = {}
+        for alias, owner, name in GRAPHQL_REPOSITORY.findall(query):
+            repo = self.server.stub.by_name.get(f"{json.loads(owner)}/{json.loads(name)}")
+            if repo is None:
+                data[alias] = None
+                continue
+            data[alias] = {
+                'defaultBranchRef': {'target': {'history': {'totalCount': repo.get('commits', 0)}}},
+                'openPulls': {'totalCount': repo.get('open_pr', 0)},
+                'closedPulls': {'totalCount': repo.get('closed_pr', 0) - repo.get('merged_pr', 0)},
+                'mergedPulls': {'totalCount': repo.get('merged_pr', 0)},
+                'openIssues': {'totalCount': repo.get('open_issue', 0)},
+                'closedIssues': {'totalCount': repo.get('closed_issue', 0)},
+            }
+        return data
+
+    def search(self, params):
+        stub = self.server.stub
+        page, per_page = int(params.get('page', 1)), int(params.get('per_page', 30))
+        items = stub.repos[(page - 1) * per_page:page * per_page]
+        body = {
+            'total_count': len(stub.repos),
+            'incomplete_results': False,
+            'items': [stub.search_item(repo) for repo in items],
+        }
+        return 200, body, {}
+
+    def paginated(self, repo, endpoint, params):
+        state = params.get('state', 'open')
+        page, per_page = int(params.get('page', 1)), int(params.get('per_page', 30))
+        total = COUNT_ENDPOINTS[endpoint](repo, state)
+        last_page = max(1, -(-total // per_page))
+        first = (page - 1) * per_page
+        items = [self.item(repo, endpoint, state, n) for n in range(first, min(first + per_page, total))]
+        headers = {}
+        if last_page > 1:
+            base = f"http://{self.headers.get('Host')}{urlparse(self.path).path}"
+            query = '&'.join(f"{key}={value}" for key, value in params.items() if key != 'page')
+            headers['Link'] = (
+                f'<{base}?{query}&page={min(page + 1, last_page)}>; rel="next", '
+                f'<{base}?{query}&page={last_page}>; rel="last"'
+            )
+        return 200, items, headers
+
+    def item(self, repo, endpoint, state, n):
+        if endpoint == 'pulls' and state == 'closed':
+            # Spread the merged PRs evenly so any sample sees the true ratio.
+            closed, merged_total = max(repo.get('closed_pr', 0), 1), repo.get('merged_pr', 0)
+            merged = (n + 1) * merged_total // closed > n * merged_total // closed
+            return {'number': n + 1, 'state': 'closed', 'merged_at': '2025-01-01T00:00:00Z' if merged else None}
+        return {'number': n + 1}
+
+    def send_payload(self, status, payload, headers):
+        self.send_response(status)
+        if status != 304:
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def start_stub_server(repos, host='127.0.0.1', port=0, **options):
+    """Serve a StubGitHub on a background thread; return (server, base_url)"""
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.stub = StubGitHub(repos, **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Serve a local stand-in for the GitHub API')
+    parser.add_argument('--data', type=str, default='data/data.json', help='Repository records to serve (default: data/data.json)')
+    parser.add_argument('--port', type=int, default=8000, help='Port to listen on (default: 8000)')
+    parser.add_argument('--rate-limit', type=int, default=5000, help='Requests allowed per window (default: 5000)')
+    parser.add_argument('--window', type=int, default=3600, help='Rate-limit window in seconds (default: 3600)')
+    
+    args = parser.parse_args()
+    
+    with open(args.data, 'r', encoding='utf-8') as f:
+        repos = json.load(f)
+    
+    server, base_url = start_stub_server(repos, port=args.port, rate_limit=args.rate_limit, window=args.window)
+    print(f"Serving {len(repos)} repositories at {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -1,38 +1,498 @@
+import json
+import os
+import time
+from contextlib import nullcontext
 import numpy as np
+from instrumentation import IterationStats
+from pareto import ParetoArchive, crowding_distance, non_dominated_ranks
+from stopping import StoppingCriteria
+from topology import neighborhood_indices
 
 
-class Particle:
-  def __init__(self, dim, bounds, reward_function):
-    self.position = np.random.uniform(bounds[:, 0], bounds[:, 1], dim)
-    self.velocity = np.random.uniform(-1, 1, dim)
-    self.best_position = np.copy(self.position)
+class ScalarRewardAdapter:
+  """
+  Batch interface over a plain scalar reward, scoring one row at a time.
+  """
+  def __init__(self, reward_function):
     self.reward_function = reward_function
-    self.best_value = self.reward_function(self.position)
+
+  def __call__(self, X):
+    return np.fromiter((self.reward_function(x) for x in X), dtype=float, count=len(X))
+
+
+def batch_reward(reward_function):
+  """
+  Return a callable mapping an (N, D) matrix to an (N,) vector of rewards.
+
+  Rewards exposing a `batch` method are used directly; anything else is
+  wrapped in a ScalarRewardAdapter.
+  """
+  batch = getattr(reward_function, 'batch', None)
+  if callable(batch):
+    return batch
+  return ScalarRewardAdapter(reward_function)
+
+
+class Objectives:
+  """
+  Several rewards scored together: one position maps to a vector of
+  values, an (N, D) matrix to an (N, M) matrix, for multi-objective runs.
+  """
+  def __init__(self, functions):
+    self.functions = list(functions)
+    self._batches = [batch_reward(function) for function in self.functions]
+
+  def __call__(self, x):
+    return np.array([function(x) for function in self.functions], dtype=float)
+
+  def batch(self, X):
+    return np.column_stack([np.asarray(batch(X), dtype=float) for batch in self._batches])
+
+
+def make_rng(seed=None):
+  """
+  Return a Generator for an int, SeedSequence or None; a Generator is used as is.
+  """
+  if isinstance(seed, np.random.Generator):
+    return seed
+  return np.random.default_rng(seed)
+
+
+def spawn_rngs(seed, n):
+  """
+  Return `n` independent child Generators, all reproducible from `seed`.
+  """
+  if isinstance(seed, np.random.Generator):
+    return seed.spawn(n)
+  if not isinstance(seed, np.random.SeedSequence):
+    seed = np.random.SeedSequence(seed)
+  return [np.random.default_rng(child) for child in seed.spawn(n)]
+
+
+class Swarm:
+  """
+  Array-backed swarm: row i of every array holds the state of particle i.
+
+  Random numbers come from `rng`, a np.random.Generator; without one the
+  global np.random state is used, as the original implementation did.
+  `maximize` picks the direction for personal and neighbourhood bests
+  alike, and `topology` (see neighborhood_indices) decides whose best
+  each particle is pulled towards. With a `surrogate` (see
+  surrogate.SurrogateModel), moved particles are pre-screened and only
+  those it selects are truly evaluated.
+  """
+  def __init__(self, num_particles, dim, bounds, reward_function, rng=None, maximize=True, topology='global',
+               surrogate=None):
+    self.rng = rng
+    self.maximize = maximize
+    self.bounds = np.asarray(bounds, dtype=float)
+    self.reward_function = reward_function
+    self._batch_reward = batch_reward(reward_function)
+    self.evaluations = 0
+    self.timed = False
+    self.fitness_seconds = 0.0
+    low, high = self.bounds[:, 0], self.bounds[:, 1]
+    # One draw per particle of (position, velocity), in the same order as the
+    # original per-particle constructor so seeded runs are unchanged.
+    u = self.random((num_particles, 2, dim))
+    self.positions = low + (high - low) * u[:, 0]
+    self.velocities = -1.0 + 2.0 * u[:, 1]
+    self.best_positions = self.positions.copy()
+    self.best_values = self.evaluate(self.positions)
+    self.global_best_position = self.best_positions[self.global_best_index()].copy()
+    self.topology = topology
+    self.neighbors = neighborhood_indices(topology, num_particles, rng)
+    self.surrogate = surrogate
+    if surrogate is not None:
+      surrogate.add(self.positions, self.best_values)
+
+  def random(self, shape):
+    if self.rng is None:
+      return np.random.random_sample(shape)
+    return self.rng.random(shape)
+
+  @property
+  def num_particles(self):
+    return self.positions.shape[0]
+
+  @property
+  def dim(self):
+    return self.positions.shape[1]
+
+  @property
+  def particles(self):
+    return [Particle.view(self, i) for i in range(self.num_particles)]
+
+  def evaluate(self, positions):
+    """
+    Score an (N, D) matrix of positions, returning an (N,) vector.
+    """
+    self.evaluations += len(positions)
+    if not self.timed:
+      return np.asarray(self._batch_reward(positions), dtype=float)
+    start = time.perf_counter()
+    values = np.asarray(self._batch_reward(positions), dtype=float)
+    self.fitness_seconds += time.perf_counter() - start
+    return values
+
+  def _normalized(self, values):
+    width = self.bounds[:, 1] - self.bounds[:, 0]
+    return values / np.where(width > 0, width, 1.0)
+
+  def diameter(self):
+    """
+    Diagonal of the swarm's bounding box, in bounds-normalized coordinates.
+    """
+    return float(np.linalg.norm(self._normalized(np.ptp(self.positions, axis=0))))
+
+  def diversity(self):
+    """
+    Mean distance of the particles from their centroid, in bounds-normalized coordinates.
+    """
+    spread = self._normalized(self.positions - self.positions.mean(axis=0))
+    return float(np.linalg.norm(spread, axis=1).mean())
+
+  def mean_speed(self):
+    """
+    Mean particle speed, in bounds-normalized coordinates.
+    """
+    return float(np.linalg.norm(self._normalized(self.velocities), axis=1).mean())
+
+  @property
+  def sign(self):
+    return 1.0 if self.maximize else -1.0
+
+  def global_best_index(self):
+    return int(np.argmax(self.sign * self.best_values))
+
+  def neighborhood_best_positions(self):
+    """
+    (N, D) matrix of the best personal best among each particle's neighbours.
+    """
+    scores = self.sign * self.best_values[self.neighbors]
+    best = self.neighbors[np.arange(self.num_particles), np.argmax(scores, axis=1)]
+    return self.best_positions[best]
+
+  def update_velocities(self, global_best, w, c1, c2, rows=None):
+    rows = slice(None) if rows is None else np.atleast_1d(rows)
+    x = self.positions[rows]
+    r = self.random((x.shape[0], 2, self.dim))
+    inertia = w * self.velocities[rows]
+    cognitive = c1 * r[:, 0] * (self.best_positions[rows] - x)
+    social = c2 * r[:, 1] * (global_best - x)
+    self.velocities[rows] = inertia + cognitive + social
+
+  def move(self, rows=None):
+    rows = slice(None) if rows is None else np.atleast_1d(rows)
+    x = np.clip(self.positions[rows] + self.velocities[rows], self.bounds[:, 0], self.bounds[:, 1])
+    self.positions[rows] = x
+    candidates = np.arange(self.num_particles)[rows]
+    if self.surrogate is not None:
+      chosen = self.surrogate.screen(x, self.sign)
+      candidates, x = candidates[chosen], x[chosen]
+    values = self.evaluate(x)
+    if self.surrogate is not None:
+      self.surrogate.add(x, values)
+    improved = self.sign * values > self.sign * self.best_values[candidates]
+    idx = candidates[improved]
+    self.best_values[idx] = values[improved]
+    self.best_positions[idx] = x[improved]
+
+  def accept_migrant(self, position, value):
+    """
+    Replace the weakest personal best with a position received from elsewhere.
+    """
+    i = int(np.argmin(self.sign * self.best_values))
+    self.best_positions[i] = position
+    self.best_values[i] = value
+    self.global_best_position = self.best_positions[self.global_best_index()].copy()
+
+  STATE_ARRAYS = ['bounds', 'positions', 'velocities', 'best_positions', 'best_values', 'global_best_position']
+
+  def save(self, path, iteration=0, complete=False):
+    """
+    Write the full swarm state, RNG state and iteration counter to an .npz
+    checkpoint; `complete` marks a finished run. The file is replaced
+    atomically.
+    """
+    if self.rng is None:
+      rng_state = {'kind': 'global', 'state': [np.asarray(part).tolist() if isinstance(part, np.ndarray) else part
+                                                for part in np.random.get_state()]}
+    else:
+      rng_state = {'kind': 'generator', 'state': self.rng.bit_generator.state}
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+      np.savez(f, iteration=iteration, evaluations=self.evaluations, maximize=self.maximize,
+               topology=self.topology, complete=complete,
+               neighbors=np.zeros((0, 0), dtype=int) if self.neighbors is None else self.neighbors,
+               rng_state=np.frombuffer(json.dumps(rng_state).encode('utf-8'), dtype=np.uint8),
+               **{name: getattr(self, name) for name in self.STATE_ARRAYS})
+    os.replace(tmp_path, path)
+
+  @staticmethod
+  def is_complete(path):
+    """
+    True if the checkpoint at `path` was written at the end of a finished run.
+    """
+    with np.load(path) as data:
+      return 'complete' in data.files and bool(data['complete'])
+
+  @classmethod
+  def restore(cls, path, reward_function):
+    """
+    Rebuild a swarm from a checkpoint written by save; returns (swarm, iteration).
+    """
+    swarm = cls.__new__(cls)
+    with np.load(path) as data:
+      for name in cls.STATE_ARRAYS:
+        setattr(swarm, name, data[name].copy())
+      iteration = int(data['iteration'])
+      swarm.evaluations = int(data['evaluations'])
+      swarm.maximize = bool(data['maximize']) if 'maximize' in data.files else True
+      swarm.neighbors = data['neighbors'] if 'neighbors' in data.files and data['neighbors'].size else None
+      if 'topology' in data.files:
+        swarm.topology = str(data['topology'])
+      else:
+        swarm.topology = 'global' if swarm.neighbors is None else None
+      rng_state = json.loads(data['rng_state'].tobytes().decode('utf-8'))
+    if rng_state['kind'] == 'global':
+      kind, key, pos, has_gauss, cached_gaussian = rng_state['state']
+      np.random.set_state((kind, np.array(key, dtype=np.uint32), pos, has_gauss, cached_gaussian))
+      swarm.rng = None
+    else:
+      bit_generator = getattr(np.random, rng_state['state']['bit_generator'])()
+      bit_generator.state = rng_state['state']
+      swarm.rng = np.random.Generator(bit_generator)
+    swarm.reward_function = reward_function
+    swarm._batch_reward = batch_reward(reward_function)
+    swarm.timed = False
+    swarm.fitness_seconds = 0.0
+    swarm.surrogate = None
+    return swarm, iteration
+
+  def step(self, w, c1, c2):
+    """
+    Advance the whole swarm by one iteration.
+    """
+    attractor = self.global_best_position if self.neighbors is None else self.neighborhood_best_positions()
+    self.update_velocities(attractor, w, c1, c2)
+    self.move()
+    self.global_best_position = self.best_positions[self.global_best_index()].copy()
+
+
+class ParetoSwarm(Swarm):
+  """
+  Multi-objective swarm: the reward returns one value per objective and
+  `modes` gives the direction of each. Non-dominated positions go to
+  `archive`, a ParetoArchive, and every particle is pulled towards its own
+  leader drawn from it. A new position replaces the personal best when it
+  dominates it, or with even odds when neither dominates the other.
+  """
+  def __init__(self, num_particles, dim, bounds, reward_function, modes, rng=None, archive_size=100):
+    self.archive = ParetoArchive(modes, archive_size)
+    super().__init__(num_particles, dim, bounds, reward_function, rng=rng)
+    self.archive.add(self.positions, self.best_values)
+
+  def global_best_index(self):
+    """
+    Least crowded personal best among those no other personal best dominates.
+    """
+    costs = self.archive.costs(self.best_values)
+    first = np.flatnonzero(non_dominated_ranks(costs) == 0)
+    return int(first[np.argmax(crowding_distance(costs[first]))])
+
+  def move(self, rows=None):
+    rows = slice(None) if rows is None else np.atleast_1d(rows)
+    x = np.clip(self.positions[rows] + self.velocities[rows], self.bounds[:, 0], self.bounds[:, 1])
+    self.positions[rows] = x
+    candidates = np.arange(self.num_particles)[rows]
+    values = self.evaluate(x)
+    new, old = self.archive.costs(values), self.archive.costs(self.best_values[candidates])
+    better = (new <= old).all(axis=1) & (new < old).any(axis=1)
+    worse = (old <= new).all(axis=1) & (old < new).any(axis=1)
+    improved = better | (~worse & (self.random(len(candidates)) < 0.5))
+    idx = candidates[improved]
+    self.best_values[idx] = values[improved]
+    self.best_positions[idx] = x[improved]
+    self.archive.add(x, values)
+
+  def step(self, w, c1, c2):
+    self.update_velocities(self.archive.leaders(self.random((self.num_particles, 2))), w, c1, c2)
+    self.move()
+    self.global_best_position = self.best_positions[self.global_best_index()].copy()
+
+
+class Particle:
+  """
+  View onto one row of a Swarm, kept for backward compatibility.
+  """
+  def __init__(self, dim, bounds, reward_function, maximize=True):
+    self._swarm = Swarm(1, dim, bounds, reward_function, maximize=maximize)
+    self._index = 0
+
+  @classmethod
+  def view(cls, swarm, index):
+    particle = cls.__new__(cls)
+    particle._swarm = swarm
+    particle._index = index
+    return particle
+
+  @property
+  def position(self):
+    return self._swarm.positions[self._index]
+
+  @position.setter
+  def position(self, value):
+    self._swarm.positions[self._index] = value
+
+  @property
+  def velocity(self):
+    return self._swarm.velocities[self._index]
+
+  @velocity.setter
+  def velocity(self, value):
+    self._swarm.velocities[self._index] = value
+
+  @property
+  def best_position(self):
+    return self._swarm.best_positions[self._index]
+
+  @property
+  def best_value(self):
+    return self._swarm.best_values[self._index]
+
+  @property
+  def reward_function(self):
+    return self._swarm.reward_function
 
   def update_velocity(self, global_best, w, c1, c2):
-    inertia = w * self.velocity
-    cognitive = c1 * np.random.rand(len(self.position)) * (self.best_position - self.position)
-    social = c2 * np.random.rand(len(self.position)) * (global_best - self.position)
-    self.velocity = inertia + cognitive + social
+    self._swarm.update_velocities(global_best, w, c1, c2, rows=self._index)
 
   def move(self, bounds):
-    self.position += self.velocity
-    self.position = np.clip(self.position, bounds[:, 0], bounds[:, 1])
-    value = self.reward_function(self.position)
-    if value < self.best_value:
-      self.best_value = value
-      self.best_position = np.copy(self.position)
+    self._swarm.bounds = np.asarray(bounds, dtype=float)
+    self._swarm.move(rows=self._index)
+
+
+def particle_swarm_optimization(dim, bounds, reward_function, num_particles=30, max_iter=100, w=0.5, c1=1.5, c2=1.5,
+                                stopping=None, return_info=False, callbacks=(), profiler=None, seed=None,
+                                checkpoint=None, checkpoint_interval=10, mode='maximize', topology='global',
+                                surrogate=None, archive_size=100):
+  """
+  Run PSO for at most `max_iter` iterations, or until a rule in `stopping`
+  (a StoppingCriteria) fires.
 
+  `mode` is 'maximize' or 'minimize'. `topology` is 'global', 'ring',
+  'von_neumann' or 'random'; anything but 'global' pulls each particle
+  towards the best of its neighbourhood instead of the whole swarm.
+  With a `surrogate` (a SurrogateModel), only the particles it predicts
+  to be most promising are truly evaluated each iteration; wrap an
+  expensive reward in an EvaluationCache to also skip repeated positions.
 
-def particle_swarm_optimization(dim, bounds, reward_function, num_particles=30, max_iter=100, w=0.5, c1=1.5, c2=1.5):
+  `mode` may also be a sequence of modes, one per objective, for a
+  multi-objective run: `reward_function` then returns one value per
+  objective (see Objectives) and the run keeps a ParetoArchive of at most
+  `archive_size` non-dominated positions. Such runs use the global
+  topology and take no callbacks, surrogate or checkpoint.
+
+  Each callable in `callbacks` receives an IterationStats after every
+  iteration and may return True to stop the run; callbacks with a `bind`
+  method, such as TrajectoryRecorder, are first given the swarm itself. `profiler`, such as a
+  HotLoopProfiler, is entered around the iteration loop. Without callbacks
+  no per-iteration statistics or timings are collected.
+
+  `seed` (an int, SeedSequence or Generator) makes the run reproducible
+  without touching the global np.random state. With `checkpoint`, the swarm
+  is saved to that path every `checkpoint_interval` iterations and at the
+  end, and a run started while the file exists resumes from it. Resuming
+  raises ValueError if `dim`, `bounds`, `num_particles`, `mode` or
+  `topology` differ from the checkpointed run; a checkpoint written at the
+  end of a finished run is not resumed, the run starts over instead.
+
+  Returns (best_position, best_value), or for several objectives the
+  (positions, values) of the archived front ordered by the first
+  objective; with `return_info=True` a third item is a dict holding the stop reason, iterations run, fitness evaluations
+  used and elapsed seconds.
+  """
+  modes = None if isinstance(mode, str) else tuple(mode)
+  for m in modes or (mode,):
+    if m not in ('maximize', 'minimize'):
+      raise ValueError(f"Unknown mode '{m}'; expected 'maximize' or 'minimize'")
+  if modes is not None and (callbacks or checkpoint or surrogate is not None or topology != 'global'):
+    raise ValueError("Callbacks, checkpoints, surrogates and local topologies need a single objective")
   bounds = np.array(bounds)
-  particles = [Particle(dim, bounds, reward_function) for _ in range(num_particles)]
-  global_best_position = max(particles, key=lambda p: p.best_value).best_position
-
-  for _ in range(max_iter):
-    for particle in particles:
-      particle.update_velocity(global_best_position, w, c1, c2)
-      particle.move(bounds)
-    global_best_position = max(particles, key=lambda p: p.best_value).best_position
-  
-  return global_best_position, reward_function(global_best_position)
+  stopping = stopping or StoppingCriteria()
+  iterations = 0
+  if checkpoint and os.path.exists(checkpoint) and not Swarm.is_complete(checkpoint):
+    swarm, iterations = Swarm.restore(checkpoint, reward_function)
+    mismatches = [
+      f"{name} {saved!r} != {given!r}" for name, saved, given, same in [
+        ('dim', swarm.dim, dim, swarm.dim == dim),
+        ('num_particles', swarm.num_particles, num_particles, swarm.num_particles == num_particles),
+        ('bounds', swarm.bounds.tolist(), bounds.tolist(),
+         swarm.bounds.shape == bounds.shape and np.array_equal(swarm.bounds, bounds.astype(float))),
+        ('mode', 'maximize' if swarm.maximize else 'minimize', mode, swarm.maximize == (mode == 'maximize')),
+        ('topology', swarm.topology, topology, swarm.topology in (None, topology)),
+      ] if not same
+    ]
+    if mismatches:
+      raise ValueError(f"Checkpoint {checkpoint} was written by a different run: " + ', '.join(mismatches))
+    if surrogate is not None:
+      swarm.surrogate = surrogate
+      surrogate.add(swarm.best_positions, swarm.best_values)
+  elif modes is not None:
+    swarm = ParetoSwarm(num_particles, dim, bounds, reward_function, modes,
+                        rng=None if seed is None else make_rng(seed), archive_size=archive_size)
+  else:
+    swarm = Swarm(num_particles, dim, bounds, reward_function, rng=None if seed is None else make_rng(seed),
+                  maximize=mode == 'maximize', topology=topology, surrogate=surrogate)
+  swarm.timed = bool(callbacks)
+  for callback in callbacks:
+    if callable(getattr(callback, 'bind', None)):
+      callback.bind(swarm)
+  stopping.start(swarm)
+
+  stop_reason = 'max_iter'
+  with profiler or nullcontext():
+    while iterations < max_iter:
+      reason = stopping.check(swarm)
+      if reason:
+        stop_reason = reason
+        break
+      if checkpoint and iterations and iterations % checkpoint_interval == 0:
+        swarm.save(checkpoint, iterations)
+      if not callbacks:
+        swarm.step(w, c1, c2)
+        iterations += 1
+        continue
+
+      fitness_before = swarm.fitness_seconds
+      start = time.perf_counter()
+      swarm.step(w, c1, c2)
+      elapsed = time.perf_counter() - start
+      iterations += 1
+      fitness_seconds = swarm.fitness_seconds - fitness_before
+      stats = IterationStats(
+        iterations, float(swarm.best_values[swarm.global_best_index()]), swarm.diversity(), swarm.mean_speed(),
+        swarm.evaluations, fitness_seconds, elapsed - fitness_seconds,
+      )
+      if any([callback(stats) for callback in callbacks]):
+        stop_reason = 'callback'
+        break
+
+  if checkpoint:
+    swarm.save(checkpoint, iterations, complete=True)
+
+  if modes is not None:
+    global_best_position, best_value = swarm.archive.front()
+  else:
+    global_best_position = swarm.global_best_position
+    best_value = reward_function(global_best_position)
+  if return_info:
+    info = {
+      'stop_reason': stop_reason,
+      'iterations': iterations,
+      'evaluations': swarm.evaluations,
+      'elapsed': stopping.elapsed(),
+    }
+    return global_best_position, best_value, info
+  return global_best_position, best_value
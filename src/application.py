@@ -1,15 +1,27 @@
 import json
+import os
 import numpy as np
+from dataset import iter_records
+from metric_store import open_metric_store
+from metric_stats import open_dataset_stats
+from neighbors import NeighborIndex
+from helpers import normalize_matrix
 
 
 FILE_LOCATION = "data/data.json"
+JSONL_FILE_LOCATION = "data/data.jsonl"
+STORE_LOCATION = "data/data.store"
+INDEX_LOCATION = "data/data.index.npz"
+STATS_LOCATION = "data/data.stats.json"
 
 
 def load_repo_data(file_path):
   """
-  Load repository data from the given JSON file.
+  Load repository data from the given JSON or JSON Lines file.
   """
   try:
+    if file_path.endswith('.jsonl'):
+      return list(iter_records(file_path))
     with open(file_path, 'r', encoding='utf-8') as f:
       return json.load(f)
   except FileNotFoundError:
@@ -19,6 +31,43 @@ def load_repo_data(file_path):
     print(f"Error: File '{file_path}' contains invalid JSON")
     return
 
+def default_data_file():
+  return JSONL_FILE_LOCATION if os.path.exists(JSONL_FILE_LOCATION) else FILE_LOCATION
+
+def iter_repo_data(file_path=None):
+  """
+  Lazily yield repository records, preferring the JSON Lines dataset.
+  """
+  return iter_records(file_path or default_data_file())
+
+def load_metric_store(file_path=None, store_path=STORE_LOCATION):
+  """
+  Open the memory-mapped metric store, rebuilding it when the dataset changed.
+  """
+  return open_metric_store(file_path or default_data_file(), store_path)
+
+def load_neighbor_index(store, bounds, index_path=INDEX_LOCATION):
+  """
+  Load the nearest-neighbor index saved next to the metric store, rebuilding
+  it when the store is newer, holds a different number of repositories or
+  the index was normalized with other bounds.
+  """
+  bounds = np.asarray(bounds, dtype=float)
+  if os.path.exists(index_path) and os.path.getmtime(index_path) >= os.path.getmtime(store.path):
+    index = NeighborIndex.load(index_path)
+    if len(index) == len(store) and index.bounds is not None and np.array_equal(index.bounds, bounds):
+      return index
+  index = NeighborIndex(normalize_matrix(store.metrics, bounds), bounds=bounds)
+  index.save(index_path)
+  return index
+
+def load_dataset_stats(file_path=None, stats_path=STATS_LOCATION):
+  """
+  Streaming statistics of the dataset, cached next to it and recomputed
+  only when the dataset changed.
+  """
+  return open_dataset_stats(file_path or default_data_file(), stats_path)
+
 def get_min_max_metrics():
   """
   Get the minimum and maximum values of the given data.
@@ -36,19 +85,66 @@ def get_min_max_metrics():
   }
   return np.array([min_max_values[metric] for metric in min_max_values])
 
-def reward_function(x):
+CORRELATION_WITH_MEAN = {
+  'commits' : 0.11,
+  'contributors' : 0.08,
+  'open_pr' : 0.17,
+  'closed_pr' : 0.06,
+  'merged_pr' : 0.11,
+  'open_issue' : 0.14,
+  'closed_issue' : 0.19,
+  'stars' : 0.08,
+  'fork' : 0.10,
+}
+
+
+class LinearReward:
   """
-  Reward function for the optimization problem.
+  Weighted sum of the metrics, with the weight vector built once.
+
+  Called with a single metric vector it returns a float; `batch` scores an
+  (N, 9) matrix in one dot product and returns an (N,) vector.
   """
-  correlation_with_mean = {
-    'commits' : 0.11,
-    'contributors' : 0.08,
-    'open_pr' : 0.17,
-    'closed_pr' : 0.06,
-    'merged_pr' : 0.11,
-    'open_issue' : 0.14,
-    'closed_issue' : 0.19,
-    'stars' : 0.08,
-    'fork' : 0.10,
-  }
-  return sum([correlation_with_mean[metric] * x[i] for i, metric in enumerate(correlation_with_mean)])
+  def __init__(self, weights):
+    self.metrics = list(weights)
+    self.weights = np.array([weights[metric] for metric in self.metrics], dtype=float)
+
+  def __call__(self, x):
+    return float(np.dot(np.asarray(x, dtype=float), self.weights))
+
+  def batch(self, X):
+    return np.asarray(X, dtype=float) @ self.weights
+
+
+reward_function = LinearReward(CORRELATION_WITH_MEAN)
+
+
+class MetricValue:
+  """
+  One metric of the vector as an objective, such as the open_issue backlog
+  in a multi-objective run.
+  """
+  def __init__(self, index):
+    self.index = index
+
+  def __call__(self, x):
+    return float(np.asarray(x, dtype=float)[self.index])
+
+  def batch(self, X):
+    return np.asarray(X, dtype=float)[:, self.index]
+
+
+def load_reward_model(file_path=None, stats_path=STATS_LOCATION):
+  """
+  Reward and bounds derived from the current dataset: each metric weighted
+  by its correlation with the mean of the standardized metrics, searched
+  within its observed range. Falls back to CORRELATION_WITH_MEAN and
+  get_min_max_metrics when there is no dataset to learn from.
+  """
+  try:
+    stats = load_dataset_stats(file_path, stats_path)
+  except FileNotFoundError:
+    stats = None
+  if stats is None or stats.count < 2:
+    return reward_function, get_min_max_metrics()
+  return LinearReward(dict(zip(CORRELATION_WITH_MEAN, stats.reward_weights()))), stats.bounds()
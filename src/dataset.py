@@ -0,0 +1,64 @@
+import argparse
+import csv
+import json
+import os
+
+
+NUMERIC_FIELDS = ['commits', 'contributors', 'open_pr', 'closed_pr', 'merged_pr',
+                  'open_issue', 'closed_issue', 'stars', 'fork']
+
+
+def iter_records(file_path):
+  """
+  Yield repository records one at a time from a .jsonl, .json or .csv file.
+
+  JSON Lines files are read a line at a time, so memory use does not grow
+  with the dataset; the other two formats are parsed whole first.
+  """
+  extension = os.path.splitext(file_path)[1].lower()
+  with open(file_path, 'r', encoding='utf-8', newline='') as f:
+    if extension == '.jsonl':
+      for line in f:
+        if line.strip():
+          yield json.loads(line)
+    elif extension == '.csv':
+      for row in csv.DictReader(f):
+        for field in NUMERIC_FIELDS:
+          if row.get(field, '') != '':
+            row[field] = int(float(row[field]))
+        yield row
+    else:
+      yield from json.load(f)
+
+
+def write_jsonl(records, file_path):
+  """
+  Write records to a JSON Lines file, returning how many were written.
+  """
+  directory = os.path.dirname(file_path)
+  if directory:
+    os.makedirs(directory, exist_ok=True)
+  count = 0
+  with open(file_path, 'w', encoding='utf-8') as f:
+    for record in records:
+      f.write(json.dumps(record, ensure_ascii=False) + '\n')
+      count += 1
+  return count
+
+
+def convert(source, destination):
+  """
+  Convert an existing data.json or data.csv file to JSON Lines.
+  """
+  return write_jsonl(iter_records(source), destination)
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description='Convert a repository dataset to JSON Lines')
+  parser.add_argument('source', help='Input .json or .csv file')
+  parser.add_argument('destination', nargs='?', default='data/data.jsonl', help='Output .jsonl file (default: data/data.jsonl)')
+
+  args = parser.parse_args()
+
+  count = convert(args.source, args.destination)
+  print(f"Wrote {count} records to {args.destination}")
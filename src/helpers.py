@@ -1,5 +1,34 @@
+import numpy as np
+
+
 def normalize(value, min_val, max_val):
     """Normalize a value to range [0,1]"""
     if max_val == min_val:
         return 0.5
     return (value - min_val) / (max_val - min_val)
+
+def normalize_matrix(values, bounds):
+    """Normalize each column of `values` to range [0,1] using the (min, max) rows of `bounds`"""
+    bounds = np.asarray(bounds, dtype=float)
+    min_vals, max_vals = bounds[:, 0], bounds[:, 1]
+    span = max_vals - min_vals
+    scaled = (np.asarray(values, dtype=float) - min_vals) / np.where(span == 0, 1, span)
+    return np.where(span == 0, 0.5, scaled)
+
+def top_k_indices(values, k=None, largest=False):
+    """Indices of the k smallest (or largest) values in order, ties broken by position
+
+    Uses partial selection, so only the candidates for the top k are sorted.
+    The result matches a stable full sort truncated to k; k=None ranks all.
+    """
+    values = np.asarray(values, dtype=float)
+    keys = -values if largest else values
+    if k is None or k >= len(keys):
+        candidates = np.arange(len(keys))
+    elif k <= 0:
+        return np.array([], dtype=int)
+    else:
+        kth = np.partition(keys, k - 1)[k - 1]
+        candidates = np.flatnonzero(keys <= kth)
+    order = np.lexsort((candidates, keys[candidates]))
+    return candidates[order][:k]
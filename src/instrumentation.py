@@ -0,0 +1,167 @@
+import cProfile
+import pstats
+import struct
+import tracemalloc
+from collections import namedtuple
+import numpy as np
+
+
+IterationStats = namedtuple('IterationStats', [
+  'iteration', 'best_value', 'diversity', 'mean_velocity', 'evaluations', 'fitness_seconds', 'update_seconds',
+])
+IterationStats.__doc__ = """
+Per-iteration data passed to particle_swarm_optimization callbacks.
+
+`diversity` is the mean distance of the particles from their centroid and
+`mean_velocity` the mean particle speed, both in bounds-normalized
+coordinates. `evaluations` is the running total of fitness evaluations;
+the two timings split this iteration between fitness evaluation and the
+velocity/position update.
+"""
+
+TRACE_MAGIC = b'PSOTRACE'
+TRACE_DTYPE = np.dtype([
+  ('iteration', '<i8'), ('best_value', '<f8'), ('diversity', '<f8'), ('mean_velocity', '<f8'),
+  ('evaluations', '<i8'), ('fitness_seconds', '<f8'), ('update_seconds', '<f8'),
+])
+
+
+class TraceRecorder:
+  """
+  Callback streaming IterationStats to a compact binary trace file.
+
+  The file is an 8-byte magic followed by fixed-size little-endian records
+  (TRACE_DTYPE); read it back with read_trace. Writes go through a buffered
+  file, so recording costs one struct pack per iteration.
+  """
+  def __init__(self, path):
+    self.path = path
+    self._pack = struct.Struct('<qdddqdd').pack
+    self._file = open(path, 'wb')
+    self._file.write(TRACE_MAGIC)
+
+  def __call__(self, stats):
+    self._file.write(self._pack(*stats))
+
+  def close(self):
+    self._file.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
+
+
+def read_trace(path):
+  """
+  Load a trace file as a structured array with one row per iteration.
+  """
+  with open(path, 'rb') as f:
+    if f.read(len(TRACE_MAGIC)) != TRACE_MAGIC:
+      raise ValueError(f"'{path}' is not a PSO trace file")
+    return np.frombuffer(f.read(), dtype=TRACE_DTYPE)
+
+
+TRAJECTORY_MAGIC = b'PSOTRAJ1'
+TRAJECTORY_HEADER = struct.Struct('<qq')
+TRAJECTORY_FRAME = struct.Struct('<qd')
+
+Trajectory = namedtuple('Trajectory', ['iterations', 'best_values', 'positions', 'bounds'])
+
+
+class TrajectoryRecorder:
+  """
+  Callback streaming every particle's position to a compact trajectory file.
+
+  particle_swarm_optimization hands it the swarm through `bind` before the
+  first iteration, which is recorded as frame 0. The file is an 8-byte
+  magic, the swarm size and dimension, the (D, 2) bounds as float64, then
+  one frame per iteration: iteration, best value and an (N, D) float32
+  block of positions. Read it back with read_trajectory.
+  """
+  def __init__(self, path, every=1):
+    self.path = path
+    self.every = every
+    self.swarm = None
+    self._file = open(path, 'wb')
+    self._file.write(TRAJECTORY_MAGIC)
+
+  def bind(self, swarm):
+    self.swarm = swarm
+    self._file.write(TRAJECTORY_HEADER.pack(swarm.num_particles, swarm.dim))
+    self._file.write(np.asarray(swarm.bounds, dtype='<f8').tobytes())
+    self._write(0)
+
+  def _write(self, iteration):
+    best_value = self.swarm.best_values[self.swarm.global_best_index()]
+    self._file.write(TRAJECTORY_FRAME.pack(iteration, best_value))
+    self._file.write(self.swarm.positions.astype('<f4').tobytes())
+
+  def __call__(self, stats):
+    if stats.iteration % self.every == 0:
+      self._write(stats.iteration)
+
+  def close(self):
+    self._file.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
+
+
+def read_trajectory(path):
+  """
+  Load a trajectory file as a Trajectory of (F,) iterations and best values,
+  (F, N, D) positions and (D, 2) bounds.
+  """
+  with open(path, 'rb') as f:
+    if f.read(len(TRAJECTORY_MAGIC)) != TRAJECTORY_MAGIC:
+      raise ValueError(f"'{path}' is not a PSO trajectory file")
+    num_particles, dim = TRAJECTORY_HEADER.unpack(f.read(TRAJECTORY_HEADER.size))
+    bounds = np.frombuffer(f.read(dim * 2 * 8), dtype='<f8').reshape(dim, 2)
+    frame_dtype = np.dtype([('iteration', '<i8'), ('best_value', '<f8'), ('positions', '<f4', (num_particles, dim))])
+    data = f.read()
+    # A run stopped mid-write leaves a partial last frame; it is skipped.
+    frames = np.frombuffer(data[:len(data) - len(data) % frame_dtype.itemsize], dtype=frame_dtype)
+  return Trajectory(frames['iteration'], frames['best_value'], frames['positions'], bounds)
+
+
+class HotLoopProfiler:
+  """
+  Context manager that particle_swarm_optimization wraps around its loop.
+
+  With `cprofile=True` the loop runs under cProfile and `stats` holds the
+  pstats.Stats afterwards (also dumped to `cprofile_output` if given). With
+  `trace_memory=True` tracemalloc runs too; `peak_memory` is the peak traced
+  size in bytes and `top_allocations` the largest allocation sites.
+  """
+  def __init__(self, cprofile=True, cprofile_output=None, trace_memory=False, top=10):
+    self.cprofile = cprofile
+    self.cprofile_output = cprofile_output
+    self.trace_memory = trace_memory
+    self.top = top
+    self.stats = None
+    self.peak_memory = None
+    self.top_allocations = []
+
+  def __enter__(self):
+    if self.trace_memory:
+      tracemalloc.start()
+    if self.cprofile:
+      self._profile = cProfile.Profile()
+      self._profile.enable()
+    return self
+
+  def __exit__(self, *exc):
+    if self.cprofile:
+      self._profile.disable()
+      self.stats = pstats.Stats(self._profile)
+      if self.cprofile_output:
+        self.stats.dump_stats(self.cprofile_output)
+    if self.trace_memory:
+      self.peak_memory = tracemalloc.get_traced_memory()[1]
+      self.top_allocations = tracemalloc.take_snapshot().statistics('lineno')[:self.top]
+      tracemalloc.stop()
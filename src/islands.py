@@ -0,0 +1,88 @@
+import multiprocessing
+import os
+import numpy as np
+from algorithm import Swarm, spawn_rngs
+
+
+def _island_worker(conn, dim, bounds, reward_function, num_particles, max_iter, migration_interval, w, c1, c2, rng,
+                   maximize, topology):
+  """
+  Run one island: step the swarm, trading best positions over `conn` every
+  `migration_interval` iterations.
+  """
+  swarm = Swarm(num_particles, dim, bounds, reward_function, rng=rng, maximize=maximize, topology=topology)
+
+  for iteration in range(1, max_iter + 1):
+    swarm.step(w, c1, c2)
+    if iteration % migration_interval == 0 and iteration < max_iter:
+      i = swarm.global_best_index()
+      conn.send((swarm.best_positions[i], swarm.best_values[i]))
+      position, value = conn.recv()
+      swarm.accept_migrant(position, value)
+
+  i = swarm.global_best_index()
+  conn.send((swarm.best_positions[i], swarm.best_values[i]))
+  conn.close()
+
+
+def island_particle_swarm_optimization(dim, bounds, reward_function, num_islands=None, num_particles=30, max_iter=100,
+                                       migration_interval=10, w=0.5, c1=1.5, c2=1.5, seed=None, mode='maximize',
+                                       topology='global'):
+  """
+  Island-model PSO: `num_islands` independent swarms of `num_particles` each,
+  one per process, exchanging their best positions along a ring every
+  `migration_interval` iterations.
+
+  Each island draws from its own child stream of `seed` (an int,
+  SeedSequence or Generator), so a run is reproducible from that one value.
+  `mode` and `topology` apply within every island, as in
+  particle_swarm_optimization. Returns (best_position, best_value) like
+  particle_swarm_optimization.
+  """
+  if mode not in ('maximize', 'minimize'):
+    raise ValueError(f"Unknown mode '{mode}'; expected 'maximize' or 'minimize'")
+  if migration_interval < 1:
+    raise ValueError(f"migration_interval must be at least 1, got {migration_interval}")
+  maximize = mode == 'maximize'
+  bounds = np.array(bounds, dtype=float)
+  num_islands = num_islands or os.cpu_count() or 1
+  rngs = spawn_rngs(seed, num_islands)
+  rounds = (max_iter - 1) // migration_interval if max_iter > 0 else 0
+
+  ctx = multiprocessing.get_context()
+  connections, processes = [], []
+  try:
+    for rng in rngs:
+      parent_conn, child_conn = ctx.Pipe()
+      process = ctx.Process(
+        target=_island_worker,
+        args=(child_conn, dim, bounds, reward_function, num_particles, max_iter, migration_interval, w, c1, c2, rng,
+              maximize, topology),
+        daemon=True,
+      )
+      process.start()
+      child_conn.close()
+      connections.append(parent_conn)
+      processes.append(process)
+
+    for _ in range(rounds):
+      bests = [_receive(conn) for conn in connections]
+      for k, conn in enumerate(connections):
+        conn.send(bests[k - 1])
+
+    bests = [_receive(conn) for conn in connections]
+  finally:
+    for process in processes:
+      process.join(timeout=1)
+      if process.is_alive():
+        process.terminate()
+
+  best_position = (max if maximize else min)(bests, key=lambda best: best[1])[0]
+  return best_position, reward_function(best_position)
+
+
+def _receive(conn):
+  try:
+    return conn.recv()
+  except EOFError:
+    raise RuntimeError("An island process exited before finishing its run")
@@ -1,42 +1,99 @@
 import json
 import numpy as np
-from application import load_repo_data, get_min_max_metrics, reward_function
-from algorithm import particle_swarm_optimization
-from helpers import normalize
+from application import MetricValue, load_metric_store, load_neighbor_index, load_reward_model, reward_function
+from algorithm import Objectives, particle_swarm_optimization, batch_reward
+from helpers import normalize_matrix, top_k_indices
+from metric_store import MetricStore
+from pareto import pareto_ranks
 
 
-def compare_repos_to_optimal(repos, optimal_position, bounds):
-    """Compare actual repositories to the optimal repository found by PSO"""
-    metrics = ['commits', 'contributors', 'open_pr', 'closed_pr', 
-               'merged_pr', 'open_issue', 'closed_issue', 'stars', 'fork']
+METRICS = ['commits', 'contributors', 'open_pr', 'closed_pr', 
+           'merged_pr', 'open_issue', 'closed_issue', 'stars', 'fork']
+
+TRADE_OFF_MODES = ('maximize', 'minimize')
+
+def trade_off_objectives(reward=None):
+    """Reward (maximized) against the open issue backlog (minimized)"""
+    return Objectives([reward or reward_function, MetricValue(METRICS.index('open_issue'))])
+
+def score_repos(metric_matrix, optimal_position, bounds, reward=None):
+    """Reward and normalized Euclidean distance to the optimal for every row of an (N, 9) metric matrix"""
+    rewards = batch_reward(reward or reward_function)(metric_matrix)
+    norm_optimal = normalize_matrix(optimal_position, bounds)
+    norm_actual = normalize_matrix(metric_matrix, bounds)
+    distances = np.sqrt(((norm_actual - norm_optimal) ** 2).sum(axis=1))
+    return rewards, distances
+
+def compare_repos_to_optimal(repos, optimal_position, bounds, k=10, index=None, reward=None):
+    """Compare actual repositories to the optimal repository found by PSO
+    
+    `repos` may be a MetricStore, whose metric matrix is used directly, or
+    any iterable of records, such as the generator from iter_repo_data,
+    which is consumed in a single pass.
     
-    repo_scores = []
+    Returns (top_by_reward, top_by_distance): the k highest-reward and the k
+    closest repositories as score dicts (every repository when k is None).
+    Dicts are only built for the rows returned. With a NeighborIndex over
+    the same rows, the closest repositories come from the index instead of
+    a scan and distances are only computed for the rows returned; the
+    ranking is identical. `reward` defaults to the fixed
+    reward_function.
+    """
+    if isinstance(repos, MetricStore):
+        metric_matrix = np.asarray(repos.metrics, dtype=float)
+        def identify(row):
+            return repos.string('name', row), repos.string('full_name', row), repos.metrics[row].tolist()
+    else:
+        rows, names = [], []
+        for repo in repos:
+            rows.append([repo.get(metric, 0) for metric in METRICS])
+            names.append((repo['name'], repo['full_name']))
+        metric_matrix = np.array(rows, dtype=float).reshape(-1, len(METRICS))
+        def identify(row):
+            return names[row][0], names[row][1], rows[row]
     
-    for repo in repos:
-        repo_metrics = []
-        for metric in metrics:
-            repo_metrics.append(repo.get(metric, 0))
-        
-        repo_reward = reward_function(repo_metrics)
-        
-        squared_diffs = []
-        for i, metric in enumerate(metrics):
-            min_val, max_val = bounds[i]
-            norm_optimal = normalize(optimal_position[i], min_val, max_val)
-            norm_actual = normalize(repo_metrics[i], min_val, max_val)
-            squared_diffs.append((norm_optimal - norm_actual) ** 2)
-        
-        distance = np.sqrt(sum(squared_diffs))
-        
-        repo_scores.append({
-            'name': repo['name'],
-            'full_name': repo['full_name'],
-            'reward': repo_reward,
-            'distance': distance,
-            'metrics': {metric: repo.get(metric, 0) for metric in metrics}
-        })
+    if index is not None:
+        # Distances come from the index for the closest rows and are only
+        # computed for the other rows that are returned.
+        rewards = batch_reward(reward or reward_function)(metric_matrix)
+        norm_optimal = normalize_matrix(optimal_position, bounds)
+        closest, closest_distances = index.nearest(norm_optimal, len(index) if k is None else k)
+        known = dict(zip(closest.tolist(), closest_distances.tolist()))
+        def distance(row):
+            if row not in known:
+                gap = normalize_matrix(metric_matrix[row:row + 1], bounds)[0] - norm_optimal
+                known[row] = float(np.sqrt((gap ** 2).sum()))
+            return known[row]
+    else:
+        rewards, distances = score_repos(metric_matrix, optimal_position, bounds, reward)
+        closest = top_k_indices(distances, k)
+        def distance(row):
+            return float(distances[row])
     
-    return repo_scores
+    def repo_score(row):
+        name, full_name, values = identify(row)
+        return {
+            'name': name,
+            'full_name': full_name,
+            'reward': float(rewards[row]),
+            'distance': distance(row),
+            'metrics': dict(zip(METRICS, values))
+        }
+    
+    top_by_reward = [repo_score(row) for row in top_k_indices(rewards, k, largest=True)]
+    top_by_distance = [repo_score(row) for row in closest]
+    return top_by_reward, top_by_distance
+
+def pareto_rank_repos(metric_matrix, front_values, objectives, modes=TRADE_OFF_MODES):
+    """Objective values and Pareto rank of every row of an (N, 9) metric matrix
+    
+    The rank is the number of points of `front_values`, such as the front
+    returned by a multi-objective particle_swarm_optimization, that dominate
+    the repository; 0 means none of them is at least as good on every
+    objective.
+    """
+    values = objectives.batch(np.asarray(metric_matrix, dtype=float))
+    return values, pareto_ranks(values, front_values, modes)
 
 def print_repo_details(repo, optimal_position, metrics):
     """Print detailed metrics for a repository compared to the optimal"""
@@ -51,22 +108,14 @@ def print_repo_details(repo, optimal_position, metrics):
         print(f"  {metric}: {actual} (optimal: {optimal:.2f})")
 
 def main():
-    repo_data = load_repo_data("data/data.json")
-    if not repo_data:
-        print("Error: No repository data found")
-        return
-    
-    print(f"Loaded {len(repo_data)} repositories")
-    
-    metrics = ['commits', 'contributors', 'open_pr', 'closed_pr', 
-               'merged_pr', 'open_issue', 'closed_issue', 'stars', 'fork']
-    bounds = get_min_max_metrics()
+    metrics = METRICS
+    reward, bounds = load_reward_model()
     
     print("Running Particle Swarm Optimization...")
     best_position, best_value = particle_swarm_optimization(
         dim=len(metrics), 
         bounds=bounds, 
-        reward_function=reward_function,
+        reward_function=reward,
         num_particles=50,
         max_iter=100
     )
@@ -77,18 +126,47 @@ def main():
     print(f"Optimal Reward Value: {best_value:.2f}")
     
     print("\nComparing repositories to the optimal...")
-    repo_scores = compare_repos_to_optimal(repo_data, best_position, bounds)
+    try:
+        store = load_metric_store()
+    except (FileNotFoundError, ValueError) as e:
+        print(f"Error: Could not read repository data ({e})")
+        return
+    if len(store) == 0:
+        print("Error: No repository data found")
+        return
+    
+    print(f"Scoring {len(store)} repositories")
+    index = load_neighbor_index(store, bounds)
+    repo_scores_by_reward, repo_scores_by_distance = compare_repos_to_optimal(store, best_position, bounds, k=10, index=index,
+                                                                                        reward=reward)
     
-    repo_scores_by_reward = sorted(repo_scores, key=lambda r: r['reward'], reverse=True)
     print("\nTop 10 Repositories by Reward Value:")
-    for i, repo in enumerate(repo_scores_by_reward[:10]):
+    for i, repo in enumerate(repo_scores_by_reward):
         print(f"{i+1}. {repo['name']} - Reward: {repo['reward']:.2f}, Distance: {repo['distance']:.4f}")
     
-    repo_scores_by_distance = sorted(repo_scores, key=lambda r: r['distance'])
     print("\nTop 10 Repositories by Proximity to Optimal:")
-    for i, repo in enumerate(repo_scores_by_distance[:10]):
+    for i, repo in enumerate(repo_scores_by_distance):
         print(f"{i+1}. {repo['name']} - Distance: {repo['distance']:.4f}, Reward: {repo['reward']:.2f}")
 
+    print("\nRunning multi-objective PSO (reward vs. open issue backlog)...")
+    objectives = trade_off_objectives(reward)
+    _, front_values = particle_swarm_optimization(
+        dim=len(metrics),
+        bounds=bounds,
+        reward_function=objectives,
+        num_particles=50,
+        max_iter=100,
+        mode=TRADE_OFF_MODES
+    )
+    values, ranks = pareto_rank_repos(store.metrics, front_values, objectives)
+    print(f"Trade-off front: {len(front_values)} points, reward {front_values[:, 0].min():.2f} to {front_values[:, 0].max():.2f}, "
+          f"open issues {front_values[:, 1].min():.0f} to {front_values[:, 1].max():.0f}")
+    
+    print("\nTop 10 Repositories by Pareto Rank (reward vs. open issues):")
+    for i, row in enumerate(np.lexsort((-values[:, 0], ranks))[:10]):
+        print(f"{i+1}. {store.string('name', row)} - Pareto rank: {ranks[row]}, Reward: {values[row, 0]:.2f}, "
+              f"Open issues: {values[row, 1]:.0f}")
+
     print("\nDetailed Analysis of Best Repository:")
     print_repo_details(repo_scores_by_distance[0], best_position, metrics)
 
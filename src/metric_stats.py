@@ -0,0 +1,150 @@
+import argparse
+import json
+import os
+import numpy as np
+from dataset import NUMERIC_FIELDS, iter_records
+
+
+class StreamingStats:
+  """
+  One-pass count, mean, min, max and co-moment matrix of the metrics.
+
+  Rows are folded in chunk by chunk with the pairwise update of Chan et al.,
+  so memory use does not grow with the dataset, and statistics computed on
+  separate shards combine exactly with merge.
+  """
+  def __init__(self, dim=len(NUMERIC_FIELDS)):
+    self.count = 0
+    self.mean = np.zeros(dim)
+    self.comoment = np.zeros((dim, dim))
+    self.min = np.full(dim, np.inf)
+    self.max = np.full(dim, -np.inf)
+
+  def update(self, X):
+    """
+    Fold an (N, D) block of rows into the statistics.
+    """
+    X = np.asarray(X, dtype=float)
+    if len(X) == 0:
+      return self
+    other = StreamingStats(X.shape[1])
+    other.count = len(X)
+    other.mean = X.mean(axis=0)
+    centered = X - other.mean
+    other.comoment = centered.T @ centered
+    other.min = X.min(axis=0)
+    other.max = X.max(axis=0)
+    return self.merge(other)
+
+  def merge(self, other):
+    """
+    Combine the statistics of another shard into this one.
+    """
+    total = self.count + other.count
+    if other.count == 0:
+      return self
+    delta = other.mean - self.mean
+    self.comoment = self.comoment + other.comoment + np.outer(delta, delta) * (self.count * other.count / total)
+    self.mean = self.mean + delta * (other.count / total)
+    self.min = np.minimum(self.min, other.min)
+    self.max = np.maximum(self.max, other.max)
+    self.count = total
+    return self
+
+  @classmethod
+  def from_records(cls, records, chunk_size=4096):
+    stats = cls()
+    rows = []
+    for record in records:
+      rows.append([record.get(metric, 0) for metric in NUMERIC_FIELDS])
+      if len(rows) == chunk_size:
+        stats.update(rows)
+        rows = []
+    return stats.update(rows)
+
+  def covariance(self):
+    return self.comoment / (self.count - 1) if self.count > 1 else np.zeros_like(self.comoment)
+
+  def variance(self):
+    return np.diag(self.covariance()).copy()
+
+  def correlation(self):
+    std = np.sqrt(self.variance())
+    scale = np.outer(std, std)
+    return np.divide(self.covariance(), scale, out=np.zeros_like(scale), where=scale > 0)
+
+  def reward_weights(self):
+    """
+    Weight of each metric: its correlation with the mean of all standardized
+    metrics, scaled so the weights sum to one.
+    """
+    correlation = self.correlation()
+    spread = np.sqrt(max(correlation.sum(), 0.0))
+    weights = correlation.sum(axis=1) / spread if spread > 0 else np.ones(len(self.mean))
+    total = weights.sum()
+    return weights / total if total > 0 else np.full(len(weights), 1 / len(weights))
+
+  def bounds(self):
+    """
+    Observed (min, max) of every metric as a (D, 2) array.
+    """
+    return np.stack([self.min, self.max], axis=1)
+
+  def to_dict(self):
+    return {
+      'metrics': NUMERIC_FIELDS,
+      'count': self.count,
+      'mean': self.mean.tolist(),
+      'comoment': self.comoment.tolist(),
+      'min': self.min.tolist(),
+      'max': self.max.tolist(),
+      'weights': dict(zip(NUMERIC_FIELDS, self.reward_weights().tolist())),
+    }
+
+  @classmethod
+  def from_dict(cls, data):
+    stats = cls(len(data['mean']))
+    stats.count = data['count']
+    stats.mean = np.array(data['mean'], dtype=float)
+    stats.comoment = np.array(data['comoment'], dtype=float)
+    stats.min = np.array(data['min'], dtype=float)
+    stats.max = np.array(data['max'], dtype=float)
+    return stats
+
+  def save(self, path):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+      json.dump(self.to_dict(), f, indent=2)
+    os.replace(tmp_path, path)
+
+  @classmethod
+  def load(cls, path):
+    with open(path, 'r', encoding='utf-8') as f:
+      return cls.from_dict(json.load(f))
+
+
+def open_dataset_stats(source, path):
+  """
+  Load the statistics cached at `path`, recomputing them first if `source` is newer.
+  """
+  if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(source):
+    stats = StreamingStats.from_records(iter_records(source))
+    stats.save(path)
+    return stats
+  return StreamingStats.load(path)
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description='Compute mergeable metric statistics, reward weights and bounds')
+  parser.add_argument('sources', nargs='*', default=['data/data.jsonl'], help='Dataset shards to combine (default: data/data.jsonl)')
+  parser.add_argument('--output', type=str, default='data/data.stats.json', help='Where to write the statistics (default: data/data.stats.json)')
+
+  args = parser.parse_args()
+
+  stats = StreamingStats()
+  for source in args.sources:
+    stats.merge(StreamingStats.from_records(iter_records(source)))
+  stats.save(args.output)
+
+  print(f"Statistics over {stats.count} repositories saved to {args.output}")
+  for metric, weight, (low, high) in zip(NUMERIC_FIELDS, stats.reward_weights(), stats.bounds()):
+    print(f"  {metric}: weight {weight:.3f}, bounds ({low:.0f}, {high:.0f})")
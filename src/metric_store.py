@@ -0,0 +1,146 @@
+import argparse
+import json
+import os
+import numpy as np
+from dataset import NUMERIC_FIELDS, iter_records
+
+
+MAGIC = b'PSOSTORE'
+VERSION = 1
+ALIGNMENT = 64
+STRING_COLUMNS = ['name', 'full_name', 'language']
+
+
+def _align(offset):
+  return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+class MetricStore:
+  """
+  Columnar, memory-mapped store of repository metrics.
+
+  File layout: an 8-byte magic, a uint32 version and a uint32 header length,
+  then a JSON header followed by 64-byte aligned sections: an (N, 9) int64
+  metric matrix in NUMERIC_FIELDS order, and for each string column an
+  (N + 1,) int64 offset array plus a UTF-8 blob. Arrays are opened with
+  np.memmap, so opening is near-instant and pages are shared between
+  processes that map the same file.
+  """
+  def __init__(self, path):
+    self.path = path
+    with open(path, 'rb') as f:
+      if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError(f"'{path}' is not a metric store")
+      version, header_len = np.frombuffer(f.read(8), dtype='<u4')
+      if version != VERSION:
+        raise ValueError(f"'{path}' has unsupported metric store version {version}")
+      self.header = json.loads(f.read(int(header_len)))
+    self.metric_names = self.header['metrics']
+    rows = self.header['rows']
+    self.metrics = self._map(self.header['metrics_offset'], '<i8', (rows, len(self.metric_names)))
+    self._strings = {}
+    for column, (offsets_at, blob_at, blob_len) in self.header['strings'].items():
+      offsets = self._map(offsets_at, '<i8', (rows + 1,))
+      blob = self._map(blob_at, 'u1', (blob_len,))
+      self._strings[column] = (offsets, blob)
+
+  def _map(self, offset, dtype, shape):
+    if 0 in shape:
+      return np.zeros(shape, dtype=dtype)
+    return np.memmap(self.path, dtype=dtype, mode='r', offset=offset, shape=shape)
+
+  def __len__(self):
+    return self.header['rows']
+
+  def string(self, column, row):
+    offsets, blob = self._strings[column]
+    return bytes(blob[offsets[row]:offsets[row + 1]]).decode('utf-8')
+
+  def strings(self, column, rows=None):
+    """
+    Decode a string column, for all rows or just the given row indices.
+    """
+    rows = range(len(self)) if rows is None else rows
+    return [self.string(column, row) for row in rows]
+
+  def record(self, row):
+    """
+    Rebuild the repository record for one row.
+    """
+    record = {column: self.string(column, row) for column in self._strings}
+    record.update(zip(self.metric_names, self.metrics[row].tolist()))
+    return record
+
+  @classmethod
+  def build(cls, records, path):
+    """
+    Write a store from an iterable of repository records and open it.
+    """
+    metrics = []
+    strings = {column: [] for column in STRING_COLUMNS}
+    for record in records:
+      metrics.append([int(record.get(metric) or 0) for metric in NUMERIC_FIELDS])
+      for column in STRING_COLUMNS:
+        strings[column].append((record.get(column) or '').encode('utf-8'))
+    metrics = np.array(metrics, dtype='<i8').reshape(-1, len(NUMERIC_FIELDS))
+    rows = len(metrics)
+
+    encoded = {}
+    for column, values in strings.items():
+      offsets = np.zeros(rows + 1, dtype='<i8')
+      offsets[1:] = np.cumsum([len(value) for value in values], dtype='<i8')
+      encoded[column] = (offsets, b''.join(values))
+
+    # The header size depends on the offsets it records, so lay the sections
+    # out against a fixed-size header reservation.
+    header = {'rows': rows, 'metrics': NUMERIC_FIELDS, 'metrics_offset': 0, 'strings': {}}
+    reserved = _align(len(MAGIC) + 8 + len(json.dumps(header)) + 64 * (len(encoded) + 1) + 256)
+    offset = reserved
+    header['metrics_offset'] = offset
+    offset = _align(offset + metrics.nbytes)
+    for column, (offsets, blob) in encoded.items():
+      offsets_at = offset
+      blob_at = _align(offsets_at + offsets.nbytes)
+      header['strings'][column] = [offsets_at, blob_at, len(blob)]
+      offset = _align(blob_at + len(blob))
+    header_bytes = json.dumps(header).encode('utf-8')
+
+    directory = os.path.dirname(path)
+    if directory:
+      os.makedirs(directory, exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+      f.write(MAGIC)
+      f.write(np.array([VERSION, len(header_bytes)], dtype='<u4').tobytes())
+      f.write(header_bytes)
+      f.seek(header['metrics_offset'])
+      f.write(metrics.tobytes())
+      for column, (offsets, blob) in encoded.items():
+        offsets_at, blob_at, _ = header['strings'][column]
+        f.seek(offsets_at)
+        f.write(offsets.tobytes())
+        f.seek(blob_at)
+        f.write(blob)
+      f.truncate(offset)
+    os.replace(tmp_path, path)
+    return cls(path)
+
+
+def open_metric_store(source, path):
+  """
+  Open the store at `path`, rebuilding it first if `source` is newer.
+  """
+  if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(source):
+    return MetricStore.build(iter_records(source), path)
+  return MetricStore(path)
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description='Build a columnar metric store from collector output')
+  parser.add_argument('source', nargs='?', default='data/data.jsonl', help='Input .jsonl, .json or .csv file (default: data/data.jsonl)')
+  parser.add_argument('destination', nargs='?', default='data/data.store', help='Output store (default: data/data.store)')
+
+  args = parser.parse_args()
+
+  store = MetricStore.build(iter_records(args.source), args.destination)
+  print(f"Wrote {len(store)} repositories to {args.destination}")
@@ -0,0 +1,185 @@
+import heapq
+import numpy as np
+
+
+class NeighborIndex:
+  """
+  KD-tree over repositories in the bounds-normalized metric space.
+
+  Distances are the same normalized Euclidean distances score_repos
+  computes, and results are ordered by (distance, row id), the same as
+  top_k_indices ranks them, so rankings agree with a full scan. Points
+  added with insert() go to a small buffer that is scanned linearly; the
+  tree is rebuilt once the buffer grows past a fraction of its size. The
+  points live in an array whose capacity doubles when full, so a stream
+  of inserts costs amortized O(1) copying per point.
+  `bounds`, when given, records the bounds the points were normalized
+  with, so a saved index can be checked before it is reused.
+  """
+  def __init__(self, points, leaf_size=128, rebuild_fraction=0.1, bounds=None):
+    self.bounds = None if bounds is None else np.asarray(bounds, dtype=float)
+    self.leaf_size = leaf_size
+    self.rebuild_fraction = rebuild_fraction
+    self.points = np.ascontiguousarray(points, dtype=float).reshape(len(points), -1)
+    self._build()
+
+  @property
+  def points(self):
+    return self._points[:self._count]
+
+  @points.setter
+  def points(self, points):
+    self._points = points
+    self._count = len(points)
+
+  def __len__(self):
+    return self._count
+
+  def _build(self):
+    n = len(self.points)
+    self.order = np.arange(n)
+    self.tree_size = n
+    dims, splits, lefts, rights, starts, ends, lows, highs = [], [], [], [], [], [], [], []
+
+    def add_node(start, end):
+      node = len(dims)
+      subset = self.points[self.order[start:end]]
+      low = subset.min(axis=0) if end > start else np.zeros(self.points.shape[1])
+      high = subset.max(axis=0) if end > start else np.zeros(self.points.shape[1])
+      dims.append(-1)
+      splits.append(0.0)
+      lefts.append(-1)
+      rights.append(-1)
+      starts.append(start)
+      ends.append(end)
+      lows.append(low)
+      highs.append(high)
+      return node
+
+    root = add_node(0, n)
+    stack = [root]
+    while stack:
+      node = stack.pop()
+      start, end = starts[node], ends[node]
+      if end - start <= self.leaf_size:
+        continue
+      dim = int(np.argmax(highs[node] - lows[node]))
+      if highs[node][dim] == lows[node][dim]:
+        continue
+      segment = self.order[start:end]
+      mid = (end - start) // 2
+      segment = segment[np.argpartition(self.points[segment, dim], mid)]
+      self.order[start:end] = segment
+      dims[node] = dim
+      splits[node] = self.points[segment[mid], dim]
+      lefts[node] = add_node(start, start + mid)
+      rights[node] = add_node(start + mid, end)
+      stack.extend([lefts[node], rights[node]])
+
+    self.node_dim = np.array(dims, dtype=int)
+    self.node_split = np.array(splits, dtype=float)
+    self.node_left = np.array(lefts, dtype=int)
+    self.node_right = np.array(rights, dtype=int)
+    self.node_start = np.array(starts, dtype=int)
+    self.node_end = np.array(ends, dtype=int)
+    self.node_low = np.array(lows, dtype=float).reshape(len(dims), -1)
+    self.node_high = np.array(highs, dtype=float).reshape(len(dims), -1)
+
+  def insert(self, point):
+    """
+    Add one normalized point and return its row id.
+    """
+    if self._count == len(self._points):
+      grown = np.empty((max(2 * len(self._points), 1), self._points.shape[1]))
+      grown[:self._count] = self._points[:self._count]
+      self._points = grown
+    self._points[self._count] = np.asarray(point, dtype=float).reshape(-1)
+    self._count += 1
+    if len(self.points) - self.tree_size > max(self.leaf_size, self.rebuild_fraction * self.tree_size):
+      self._build()
+    return len(self.points) - 1
+
+  def _distances(self, ids, query):
+    return np.sqrt(((self.points[ids] - query) ** 2).sum(axis=1))
+
+  def _box_distance(self, node, query):
+    gap = np.maximum(np.maximum(self.node_low[node] - query, query - self.node_high[node]), 0)
+    return np.sqrt((gap ** 2).sum())
+
+  def _search(self, query, bound):
+    """
+    Visit candidate leaves nearest first; `bound()` gives the current pruning radius.
+    """
+    if self.tree_size:
+      heap = [(self._box_distance(0, query), 0)]
+      while heap:
+        box_distance, node = heapq.heappop(heap)
+        if box_distance > bound():
+          break
+        if self.node_dim[node] < 0:
+          yield self.order[self.node_start[node]:self.node_end[node]]
+          continue
+        for child in (self.node_left[node], self.node_right[node]):
+          heapq.heappush(heap, (self._box_distance(child, query), child))
+    if len(self.points) > self.tree_size:
+      yield np.arange(self.tree_size, len(self.points))
+
+  def nearest(self, query, k=10):
+    """
+    Return (ids, distances) of the k points closest to `query`; both are
+    empty when k < 1.
+    """
+    query = np.asarray(query, dtype=float)
+    best_ids = np.array([], dtype=int)
+    best_distances = np.array([], dtype=float)
+    if k < 1:
+      return best_ids, best_distances
+
+    def bound():
+      return best_distances[-1] if len(best_distances) >= k else np.inf
+
+    for ids in self._search(query, bound):
+      ids = np.concatenate([best_ids, ids])
+      distances = np.concatenate([best_distances, self._distances(ids[len(best_ids):], query)])
+      order = np.lexsort((ids, distances))[:k]
+      best_ids, best_distances = ids[order], distances[order]
+    return best_ids, best_distances
+
+  def within(self, query, radius):
+    """
+    Return (ids, distances) of every point within `radius` of `query`, closest first.
+    """
+    query = np.asarray(query, dtype=float)
+    found_ids, found_distances = [], []
+    for ids in self._search(query, lambda: radius):
+      distances = self._distances(ids, query)
+      keep = distances <= radius
+      found_ids.append(ids[keep])
+      found_distances.append(distances[keep])
+    ids = np.concatenate(found_ids) if found_ids else np.array([], dtype=int)
+    distances = np.concatenate(found_distances) if found_distances else np.array([], dtype=float)
+    order = np.lexsort((ids, distances))
+    return ids[order], distances[order]
+
+  TREE_ARRAYS = ['order', 'node_dim', 'node_split', 'node_left', 'node_right',
+                 'node_start', 'node_end', 'node_low', 'node_high']
+
+  def save(self, path):
+    """
+    Write the points, the built tree and the normalization bounds to an .npz file.
+    """
+    np.savez(path, points=self.points, bounds=np.zeros((0, 2)) if self.bounds is None else self.bounds, tree_size=self.tree_size, leaf_size=self.leaf_size,
+             rebuild_fraction=self.rebuild_fraction, **{name: getattr(self, name) for name in self.TREE_ARRAYS})
+
+  @classmethod
+  def load(cls, path):
+    with np.load(path) as data:
+      index = cls.__new__(cls)
+      index.points = data['points']
+      index.bounds = data['bounds'] if 'bounds' in data.files and data['bounds'].size else None
+      index.tree_size = int(data['tree_size'])
+      index.leaf_size = int(data['leaf_size'])
+      index.rebuild_fraction = float(data['rebuild_fraction'])
+      for name in cls.TREE_ARRAYS:
+        setattr(index, name, data[name])
+    return index
@@ -0,0 +1,170 @@
+import bisect
+import numpy as np
+
+
+def senses_of(modes):
+  """
+  +1/-1 vector for a sequence of 'maximize'/'minimize' modes.
+  """
+  return np.array([1.0 if mode == 'maximize' else -1.0 for mode in modes])
+
+
+def dominates(a, b):
+  """
+  (len(a), len(b)) boolean matrix: row i of `a` dominates row j of `b`.
+  Both are cost matrices, lower being better on every column.
+  """
+  a, b = a[:, None, :], b[None, :, :]
+  return (a <= b).all(axis=2) & (a < b).any(axis=2)
+
+
+def _ranks_2d(costs):
+  """
+  Front index of every row for two objectives, by one sweep in
+  lexicographic order: a row joins the first front whose latest member
+  does not dominate it, found by bisection. O(n log n).
+  """
+  order = np.lexsort((costs[:, 1], costs[:, 0]))
+  ranks = np.empty(len(costs), dtype=np.int64)
+  last = []
+  previous = None
+  for i in order:
+    if previous is not None and (costs[i] == costs[previous]).all():
+      # Equal rows do not dominate each other.
+      ranks[i] = ranks[previous]
+    else:
+      front = bisect.bisect_right(last, costs[i, 1])
+      if front == len(last):
+        last.append(costs[i, 1])
+      else:
+        last[front] = costs[i, 1]
+      ranks[i] = front
+    previous = i
+  return ranks
+
+
+def non_dominated_ranks(costs):
+  """
+  Front index of every row of an (N, M) cost matrix: 0 for the
+  non-dominated rows, 1 for those only dominated by front 0, and so on.
+
+  Two objectives use an O(n log n) sweep; more use the fast
+  non-dominated sort, with the dominance counts kept as arrays.
+  """
+  costs = np.asarray(costs, dtype=float)
+  if len(costs) == 0:
+    return np.zeros(0, dtype=np.int64)
+  if costs.shape[1] == 2:
+    return _ranks_2d(costs)
+  dominance = dominates(costs, costs)
+  counts = dominance.sum(axis=0)
+  ranks = np.full(len(costs), -1, dtype=np.int64)
+  front = 0
+  while (ranks < 0).any():
+    current = (counts == 0) & (ranks < 0)
+    ranks[current] = front
+    counts -= dominance[current].sum(axis=0)
+    front += 1
+  return ranks
+
+
+def crowding_distance(costs):
+  """
+  Crowding distance of every row of an (N, M) cost matrix: the sum over
+  objectives of the range-normalized gap between its two neighbours.
+  Extremes on any objective get infinity.
+  """
+  costs = np.asarray(costs, dtype=float)
+  n = len(costs)
+  if n <= 2:
+    return np.full(n, np.inf)
+  order = np.argsort(costs, axis=0, kind='stable')
+  ordered = np.take_along_axis(costs, order, axis=0)
+  span = ordered[-1] - ordered[0]
+  gaps = np.empty_like(ordered)
+  gaps[[0, -1]] = np.inf
+  gaps[1:-1] = (ordered[2:] - ordered[:-2]) / np.where(span > 0, span, 1.0)
+  distance = np.zeros(n)
+  np.add.at(distance, order.ravel(), gaps.ravel())
+  return distance
+
+
+def pareto_ranks(values, front_values, modes, chunk_size=1024):
+  """
+  Number of rows of `front_values` that dominate each row of `values`,
+  both in objective space with `modes` giving each objective's direction.
+  0 means no point of the front is at least as good on every objective.
+  """
+  senses = senses_of(modes)
+  costs = -senses * np.asarray(values, dtype=float).reshape(-1, len(senses))
+  reference = -senses * np.asarray(front_values, dtype=float).reshape(-1, len(senses))
+  counts = np.empty(len(costs), dtype=np.int64)
+  for start in range(0, len(costs), chunk_size):
+    counts[start:start + chunk_size] = dominates(reference, costs[start:start + chunk_size]).sum(axis=0)
+  return counts
+
+
+class ParetoArchive:
+  """
+  Bounded external archive of the non-dominated positions found so far.
+
+  Every `add` keeps the first front of the archive and the new points,
+  drops repeated objective vectors, then removes the most crowded point
+  until at most `max_size` are left. Leaders are picked by binary
+  tournament on crowding distance, so sparse regions of the front pull
+  harder than crowded ones.
+  """
+  def __init__(self, modes, max_size=100):
+    self.modes = tuple(modes)
+    self.senses = senses_of(self.modes)
+    self.max_size = max_size
+    self.positions = None
+    self.values = np.zeros((0, len(self.senses)))
+    self.crowding = np.zeros(0)
+
+  def __len__(self):
+    return len(self.values)
+
+  def costs(self, values):
+    return -self.senses * np.asarray(values, dtype=float)
+
+  def add(self, positions, values):
+    positions = np.asarray(positions, dtype=float)
+    values = np.asarray(values, dtype=float).reshape(len(positions), len(self.senses))
+    if self.positions is not None:
+      positions = np.vstack([self.positions, positions])
+      values = np.vstack([self.values, values])
+    costs = self.costs(values)
+    keep = np.flatnonzero(non_dominated_ranks(costs) == 0)
+    _, first = np.unique(costs[keep], axis=0, return_index=True)
+    keep = keep[np.sort(first)]
+    positions, values, costs = positions[keep], values[keep], costs[keep]
+    crowding = crowding_distance(costs)
+    while len(values) > self.max_size:
+      keep = np.delete(np.arange(len(values)), np.argmin(crowding))
+      positions, values, costs = positions[keep], values[keep], costs[keep]
+      crowding = crowding_distance(costs)
+    self.positions, self.values, self.crowding = positions, values, crowding
+
+  def leaders(self, draws):
+    """
+    One leader position per row of `draws`, an (n, 2) array of uniform
+    numbers in [0, 1) choosing the two archive members of each tournament.
+    """
+    picks = np.minimum((np.asarray(draws) * len(self)).astype(np.int64), len(self) - 1)
+    first, second = picks[:, 0], picks[:, 1]
+    winners = np.where(self.crowding[first] >= self.crowding[second], first, second)
+    return self.positions[winners]
+
+  def rank(self, values):
+    """
+    Number of archive members dominating each row of `values`.
+    """
+    return pareto_ranks(values, self.values, self.modes)
+
+  def front(self):
+    """
+    (positions, values) of the archive, ordered by the first objective.
+    """
+    order = np.argsort(self.costs(self.values)[:, 0], kind='stable')
+    return self.positions[order], self.values[order]
@@ -0,0 +1,205 @@
+import random
+import numpy as np
+from main import METRICS, compare_repos_to_optimal, score_repos
+
+
+class _Node:
+  __slots__ = ('key', 'priority', 'left', 'right', 'size')
+
+  def __init__(self, key, priority):
+    self.key = key
+    self.priority = priority
+    self.left = None
+    self.right = None
+    self.size = 1
+
+
+def _size(node):
+  return node.size if node is not None else 0
+
+
+def _update(node):
+  node.size = 1 + _size(node.left) + _size(node.right)
+  return node
+
+
+def _split(node, key):
+  """
+  Split into the nodes with keys below `key` and the rest.
+  """
+  if node is None:
+    return None, None
+  if node.key < key:
+    node.right, right = _split(node.right, key)
+    return _update(node), right
+  left, node.left = _split(node.left, key)
+  return left, _update(node)
+
+
+def _merge(left, right):
+  if left is None or right is None:
+    return left or right
+  if left.priority > right.priority:
+    left.right = _merge(left.right, right)
+    return _update(left)
+  right.left = _merge(left, right.left)
+  return _update(right)
+
+
+class OrderStatisticTree:
+  """
+  Treap of unique, comparable keys with subtree sizes: insert, remove and
+  rank in expected O(log n), the k smallest keys in O(k + log n).
+  """
+  def __init__(self, seed=0):
+    self.root = None
+    self._random = random.Random(seed)
+
+  def __len__(self):
+    return _size(self.root)
+
+  def insert(self, key):
+    left, right = _split(self.root, key)
+    self.root = _merge(_merge(left, _Node(key, self._random.random())), right)
+
+  def remove(self, key):
+    def remove_from(node):
+      if node is None:
+        raise KeyError(key)
+      if key < node.key:
+        node.left = remove_from(node.left)
+      elif node.key < key:
+        node.right = remove_from(node.right)
+      else:
+        return _merge(node.left, node.right)
+      return _update(node)
+    self.root = remove_from(self.root)
+
+  def rank(self, key):
+    """
+    Number of keys smaller than `key`.
+    """
+    node, rank = self.root, 0
+    while node is not None:
+      if node.key < key:
+        rank += _size(node.left) + 1
+        node = node.right
+      else:
+        node = node.left
+    return rank
+
+  def smallest(self, k):
+    keys, stack, node = [], [], self.root
+    while (stack or node is not None) and len(keys) < k:
+      while node is not None:
+        stack.append(node)
+        node = node.left
+      node = stack.pop()
+      keys.append(node.key)
+      node = node.right
+    return keys
+
+
+class IncrementalRanking:
+  """
+  Top-k repositories by reward and by distance to an optimal position, kept
+  up to date as individual records are inserted, updated or removed.
+
+  Each repository keeps the position it was first inserted at, and ties are
+  broken by that position, so top_by_reward and top_by_distance match
+  compare_repos_to_optimal over the current records in insertion order.
+  Changing the optimal position re-keys the distance tree in O(n log n).
+  """
+  def __init__(self, optimal_position, bounds, reward=None):
+    self.optimal_position = np.asarray(optimal_position, dtype=float)
+    self.bounds = np.asarray(bounds, dtype=float)
+    self.reward = reward
+    self.records = {}
+    self.entries = {}
+    self.by_reward = OrderStatisticTree()
+    self.by_distance = OrderStatisticTree()
+    self._next_position = 0
+
+  def __len__(self):
+    return len(self.entries)
+
+  def _score(self, record):
+    row = np.array([[record.get(metric, 0) for metric in METRICS]], dtype=float)
+    rewards, distances = score_repos(row, self.optimal_position, self.bounds, self.reward)
+    return float(rewards[0]), float(distances[0])
+
+  def upsert(self, record):
+    """
+    Insert a record, or replace the one with the same full_name.
+    """
+    full_name = record['full_name']
+    position = self._next_position
+    if full_name in self.entries:
+      position = self.entries[full_name][0]
+      self._unlink(full_name)
+    else:
+      self._next_position += 1
+    reward, distance = self._score(record)
+    self.entries[full_name] = (position, reward, distance)
+    self.records[full_name] = record
+    self.by_reward.insert((-reward, position, full_name))
+    self.by_distance.insert((distance, position, full_name))
+
+  def remove(self, full_name):
+    self._unlink(full_name)
+    del self.entries[full_name]
+    del self.records[full_name]
+
+  def _unlink(self, full_name):
+    position, reward, distance = self.entries[full_name]
+    self.by_reward.remove((-reward, position, full_name))
+    self.by_distance.remove((distance, position, full_name))
+
+  def set_optimal(self, optimal_position):
+    self.optimal_position = np.asarray(optimal_position, dtype=float)
+    self.by_distance = OrderStatisticTree()
+    for full_name, record in self.records.items():
+      position, reward, _ = self.entries[full_name]
+      _, distance = self._score(record)
+      self.entries[full_name] = (position, reward, distance)
+      self.by_distance.insert((distance, position, full_name))
+
+  def _repo_score(self, full_name):
+    record = self.records[full_name]
+    _, reward, distance = self.entries[full_name]
+    return {
+      'name': record['name'],
+      'full_name': full_name,
+      'reward': reward,
+      'distance': distance,
+      'metrics': {metric: record.get(metric, 0) for metric in METRICS},
+    }
+
+  def top_by_reward(self, k=10):
+    return [self._repo_score(key[2]) for key in self.by_reward.smallest(k)]
+
+  def top_by_distance(self, k=10):
+    return [self._repo_score(key[2]) for key in self.by_distance.smallest(k)]
+
+  def ordered_records(self):
+    """
+    The current records in insertion order, as a full recompute would see them.
+    """
+    return [self.records[name] for name in sorted(self.entries, key=lambda name: self.entries[name][0])]
+
+
+def check_against_full_recompute(ranking, k=10):
+  """
+  Differential check of the incremental top-k against compare_repos_to_optimal
+  over the same records; returns the mismatches found (empty when equal).
+  """
+  expected_reward, expected_distance = compare_repos_to_optimal(
+    ranking.ordered_records(), ranking.optimal_position, ranking.bounds, k=k, reward=ranking.reward)
+  mismatches = []
+  for label, actual, expected in [('reward', ranking.top_by_reward(k), expected_reward),
+                                  ('distance', ranking.top_by_distance(k), expected_distance)]:
+    actual_names = [repo['full_name'] for repo in actual]
+    expected_names = [repo['full_name'] for repo in expected]
+    if actual_names != expected_names:
+      mismatches.append(f"top by {label}: {actual_names} != {expected_names}")
+  return mismatches
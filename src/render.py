@@ -0,0 +1,220 @@
+"""
+Offline renderer for trajectory files written by TrajectoryRecorder.
+
+    python src/render.py record data/trajectory.bin --fitness rastrigin --dim 2
+    python src/render.py render data/trajectory.bin img/pso.gif --background rastrigin
+
+Rendering never runs the optimizer and uses the non-interactive Agg
+backend, so it works on machines without a display. The background is
+drawn once; every frame restores it and redraws only the particles.
+Frames are written as a PNG sequence (a directory), a GIF, or a video
+through ffmpeg for any other extension.
+"""
+import argparse
+import os
+import subprocess
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+from PIL import Image
+from algorithm import batch_reward, particle_swarm_optimization
+from application import get_min_max_metrics, reward_function
+from instrumentation import TrajectoryRecorder, read_trajectory
+
+
+class Rastrigin:
+  """
+  Rastrigin function of one position, with `batch` scoring an (N, D) matrix at once.
+  """
+  def __call__(self, x):
+    return float(self.batch(np.asarray(x, dtype=float)[None, :])[0])
+
+  def batch(self, X):
+    X = np.asarray(X, dtype=float)
+    return 10 * X.shape[1] + (X ** 2 - 10 * np.cos(2 * np.pi * X)).sum(axis=1)
+
+
+BACKGROUNDS = {
+  'rastrigin': Rastrigin(),
+  'reward': reward_function,
+}
+
+
+class Projection:
+  """
+  Fixed linear map from the search space to the 2-D view.
+
+  Two-dimensional problems are shown as they are. Otherwise positions are
+  normalized by the bounds and projected onto the two principal components
+  of all recorded positions, so the view does not move between frames.
+  """
+  def __init__(self, positions, bounds):
+    self.bounds = np.asarray(bounds, dtype=float)
+    width = self.bounds[:, 1] - self.bounds[:, 0]
+    self.width = np.where(width > 0, width, 1.0)
+    dim = self.bounds.shape[0]
+    if dim == 2:
+      self.center = np.zeros(2)
+      self.components = np.eye(2)
+      self.scale = np.ones(2)
+      self.low = np.zeros(2)
+      self.labels = ('x0', 'x1')
+    else:
+      points = (positions.reshape(-1, dim) - self.bounds[:, 0]) / self.width
+      self.center = points.mean(axis=0)
+      _, singular, vt = np.linalg.svd(points - self.center, full_matrices=False)
+      self.components = vt[:2].T
+      self.scale = self.width
+      self.low = self.bounds[:, 0]
+      explained = singular[:2] ** 2 / max((singular ** 2).sum(), 1e-300)
+      self.labels = tuple(f'PC{i + 1} ({share:.0%})' for i, share in enumerate(explained))
+
+  def project(self, X):
+    return ((np.asarray(X, dtype=float) - self.low) / self.scale - self.center) @ self.components
+
+  def unproject(self, P):
+    """
+    Points of the search space shown at 2-D view coordinates `P`, clipped to the bounds.
+    """
+    X = (np.asarray(P, dtype=float) @ self.components.T + self.center) * self.scale + self.low
+    return np.clip(X, self.bounds[:, 0], self.bounds[:, 1])
+
+
+def background_grid(projection, extent, fitness, resolution=200):
+  """
+  Fitness over a resolution x resolution grid of the view, evaluated in one batch.
+  """
+  xs = np.linspace(extent[0], extent[1], resolution)
+  ys = np.linspace(extent[2], extent[3], resolution)
+  gx, gy = np.meshgrid(xs, ys)
+  points = projection.unproject(np.column_stack([gx.ravel(), gy.ravel()]))
+  return np.asarray(batch_reward(fitness)(points), dtype=float).reshape(resolution, resolution)
+
+
+class FrameWriter:
+  """
+  Sink for RGBA frames: a directory of PNGs, a GIF, or ffmpeg for video.
+  """
+  def __init__(self, path, size, fps):
+    self.path = path
+    self.size = size
+    self.fps = fps
+    self.frames = []
+    self.count = 0
+    self.process = None
+    extension = os.path.splitext(path)[1].lower()
+    self.kind = 'png' if extension == '' else ('gif' if extension == '.gif' else 'video')
+    if self.kind == 'png':
+      os.makedirs(path, exist_ok=True)
+    elif self.kind == 'video':
+      try:
+        self.process = subprocess.Popen(
+          ['ffmpeg', '-y', '-loglevel', 'error', '-f', 'rawvideo', '-pix_fmt', 'rgba', '-s', f'{size[0]}x{size[1]}',
+           '-r', str(fps), '-i', '-', '-pix_fmt', 'yuv420p', path],
+          stdin=subprocess.PIPE,
+        )
+      except FileNotFoundError:
+        raise RuntimeError(f"Writing {path} needs ffmpeg; render to a .gif or a directory of PNG frames instead")
+
+  def write(self, rgba):
+    if self.kind == 'png':
+      # Frames are intermediate files; fast compression keeps encoding from dominating the render.
+      Image.fromarray(rgba).save(os.path.join(self.path, f'frame_{self.count:05d}.png'), compress_level=1)
+    elif self.kind == 'gif':
+      self.frames.append(Image.fromarray(rgba).convert('RGB').quantize(colors=255))
+    else:
+      self.process.stdin.write(rgba.tobytes())
+    self.count += 1
+
+  def close(self):
+    if self.kind == 'gif' and self.frames:
+      self.frames[0].save(self.path, save_all=True, append_images=self.frames[1:], duration=int(1000 / self.fps), loop=0)
+    elif self.kind == 'video':
+      self.process.stdin.close()
+      self.process.wait()
+
+
+def render_trajectory(trajectory, output, background=None, fps=10, size=(640, 480), dpi=100, resolution=200):
+  """
+  Render every frame of `trajectory` to `output`; `background` is a fitness
+  function (or a BACKGROUNDS name) drawn behind the particles.
+  Returns the number of frames written.
+  """
+  if isinstance(background, str):
+    background = BACKGROUNDS[background]
+  projection = Projection(trajectory.positions, trajectory.bounds)
+  projected = projection.project(trajectory.positions)
+
+  low, high = projected.reshape(-1, 2).min(axis=0), projected.reshape(-1, 2).max(axis=0)
+  if trajectory.bounds.shape[0] == 2:
+    low, high = trajectory.bounds[:, 0], trajectory.bounds[:, 1]
+  margin = (high - low) * 0.05 + 1e-9
+  extent = (low[0] - margin[0], high[0] + margin[0], low[1] - margin[1], high[1] + margin[1])
+
+  fig, ax = plt.subplots(figsize=(size[0] / dpi, size[1] / dpi), dpi=dpi)
+  if background is not None:
+    grid = background_grid(projection, extent, background, resolution)
+    image = ax.imshow(grid, extent=extent, origin='lower', aspect='auto', cmap='viridis')
+    fig.colorbar(image, ax=ax)
+  ax.set_xlim(extent[0], extent[1])
+  ax.set_ylim(extent[2], extent[3])
+  ax.set_xlabel(projection.labels[0])
+  ax.set_ylabel(projection.labels[1])
+  scatter = ax.scatter([], [], s=12, color='red', animated=True)
+  label = ax.text(0.02, 0.97, '', transform=ax.transAxes, va='top', color='white',
+                  bbox={'facecolor': 'black', 'alpha': 0.5, 'linewidth': 0}, animated=True)
+
+  fig.canvas.draw()
+  static = fig.canvas.copy_from_bbox(fig.bbox)
+  width, height = fig.canvas.get_width_height()
+  writer = FrameWriter(output, (width, height), fps)
+  try:
+    for frame in range(len(trajectory.iterations)):
+      fig.canvas.restore_region(static)
+      scatter.set_offsets(projected[frame])
+      label.set_text(f'Iteration {trajectory.iterations[frame]}  best {trajectory.best_values[frame]:.4g}')
+      ax.draw_artist(scatter)
+      ax.draw_artist(label)
+      writer.write(np.asarray(fig.canvas.buffer_rgba()).copy())
+  finally:
+    writer.close()
+    plt.close(fig)
+  return writer.count
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description='Record PSO trajectories and render them headlessly')
+  subparsers = parser.add_subparsers(dest='command', required=True)
+
+  record = subparsers.add_parser('record', help='Run the optimizer and record a trajectory file')
+  record.add_argument('trajectory', help='Trajectory file to write')
+  record.add_argument('--fitness', choices=list(BACKGROUNDS), default='rastrigin', help='Function to optimize (default: rastrigin)')
+  record.add_argument('--dim', type=int, default=2, help='Dimensions for rastrigin (default: 2)')
+  record.add_argument('--particles', type=int, default=30, help='Swarm size (default: 30)')
+  record.add_argument('--iterations', type=int, default=100, help='Iterations (default: 100)')
+  record.add_argument('--seed', type=int, default=0, help='Seed for the run (default: 0)')
+
+  render = subparsers.add_parser('render', help='Render a trajectory file to frames, a GIF or a video')
+  render.add_argument('trajectory', help='Trajectory file to read')
+  render.add_argument('output', help='Directory for PNG frames, a .gif, or a video file such as .mp4 (needs ffmpeg)')
+  render.add_argument('--background', choices=list(BACKGROUNDS), help='Fitness landscape drawn behind the particles')
+  render.add_argument('--fps', type=int, default=10, help='Frames per second (default: 10)')
+  render.add_argument('--resolution', type=int, default=200, help='Background grid points per axis (default: 200)')
+
+  args = parser.parse_args()
+
+  if args.command == 'record':
+    if args.fitness == 'rastrigin':
+      dim, bounds, mode = args.dim, np.array([(-5.12, 5.12)] * args.dim), 'minimize'
+    else:
+      bounds = get_min_max_metrics()
+      dim, mode = len(bounds), 'maximize'
+    with TrajectoryRecorder(args.trajectory) as recorder:
+      _, best_value = particle_swarm_optimization(dim, bounds, BACKGROUNDS[args.fitness], num_particles=args.particles,
+                                                  max_iter=args.iterations, seed=args.seed, mode=mode, callbacks=[recorder])
+    print(f"Recorded {args.iterations} iterations to {args.trajectory} (best value {best_value:.4f})")
+  else:
+    count = render_trajectory(read_trajectory(args.trajectory), args.output, args.background, fps=args.fps,
+                              resolution=args.resolution)
+    print(f"Rendered {count} frames to {args.output}")
@@ -0,0 +1,345 @@
+"""
+Resident scoring service: loads the dataset once, caches PSO results and
+answers ranking queries over local HTTP or a Unix socket.
+
+    python src/service.py --port 8080
+    curl 'http://127.0.0.1:8080/rank?k=10&num_particles=50&max_iter=100&seed=0'
+    curl 'http://127.0.0.1:8080/top?k=10'
+    curl 'http://127.0.0.1:8080/stats'
+
+The dataset is reloaded when its file changes; its metric store, statistics
+and neighbour index are cached next to it. PSO results are cached by
+(bounds, reward weights, optimizer parameters, seed); runs without a seed
+are not cached. /top serves an IncrementalRanking for the default
+optimizer parameters: on reload only the records that were added, changed
+or removed are applied to it.
+"""
+import argparse
+import json
+import os
+import socketserver
+import threading
+import time
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import numpy as np
+from algorithm import batch_reward, particle_swarm_optimization
+from application import default_data_file, load_metric_store, load_neighbor_index, load_reward_model
+from dataset import iter_records
+from helpers import normalize_matrix, top_k_indices
+from main import METRICS
+from ranking import IncrementalRanking
+
+
+OPTIMIZER_PARAMS = {
+  'num_particles': (int, 50),
+  'max_iter': (int, 100),
+  'w': (float, 0.5),
+  'c1': (float, 1.5),
+  'c2': (float, 1.5),
+  'seed': (int, 0),
+  'mode': (str, 'maximize'),
+  'topology': (str, 'global'),
+}
+
+
+class DatasetState:
+  """
+  Everything derived from one version of the dataset, swapped as a whole on reload.
+  """
+  def __init__(self, data_file):
+    self.data_file = data_file
+    self.mtime = os.path.getmtime(data_file)
+    base = os.path.splitext(data_file)[0]
+    self.reward, self.bounds = load_reward_model(data_file, base + '.stats.json')
+    self.store = load_metric_store(data_file, base + '.store')
+    self.metrics = np.asarray(self.store.metrics, dtype=float)
+    self.normalized = normalize_matrix(self.metrics, self.bounds)
+    self.index = load_neighbor_index(self.store, self.bounds, base + '.index.npz')
+    self.rewards = np.asarray(batch_reward(self.reward)(self.metrics), dtype=float)
+    self.weights = tuple(np.asarray(self.reward.weights, dtype=float).tolist())
+    self.records = {record['full_name']: record for record in iter_records(data_file)}
+
+  def repo_score(self, row, distance):
+    return {
+      'name': self.store.string('name', row),
+      'full_name': self.store.string('full_name', row),
+      'reward': float(self.rewards[row]),
+      'distance': float(distance),
+      'metrics': dict(zip(METRICS, self.store.metrics[row].tolist())),
+    }
+
+
+class ScoringService:
+  """
+  Dataset, PSO result cache and counters shared by all request threads.
+
+  The data file's modification time is checked at most every
+  `reload_interval` seconds; when it changed, the dataset is reloaded and
+  only the changed records are applied to the live ranking behind /top.
+  """
+  def __init__(self, data_file=None, cache_size=128, reload_interval=1.0, ranking_tolerance=0.05):
+    self.data_file = data_file or default_data_file()
+    self.cache_size = cache_size
+    self.reload_interval = reload_interval
+    self.results = OrderedDict()
+    self.counters = {'requests': 0, 'errors': 0, 'cache_hits': 0, 'cache_misses': 0, 'reloads': 0,
+                     'ranking_updates': 0}
+    self.ranking_tolerance = ranking_tolerance
+    self.ranking = None
+    self._ranking_value = None
+    self._ranking_model = None
+    self.latencies = deque(maxlen=1000)
+    self._lock = threading.Lock()
+    self._checked = time.monotonic()
+    self.state = DatasetState(self.data_file)
+
+  def maybe_reload(self):
+    now = time.monotonic()
+    with self._lock:
+      if now - self._checked < self.reload_interval:
+        return False
+      self._checked = now
+    try:
+      changed = os.path.getmtime(self.data_file) != self.state.mtime
+    except FileNotFoundError:
+      return False
+    if changed:
+      state = DatasetState(self.data_file)
+      with self._lock:
+        previous, self.state = self.state, state
+        self.counters['reloads'] += 1
+        if self.ranking is not None:
+          self._refresh_ranking(previous, state)
+    return changed
+
+  def _model_drift(self, state):
+    """
+    Largest change of a reward weight (relative) or bound (relative to the
+    range) since the live ranking was built.
+    """
+    bounds, weights = self._ranking_model
+    span = np.where(bounds[:, 1] > bounds[:, 0], bounds[:, 1] - bounds[:, 0], 1.0)
+    weight_drift = np.abs(np.array(state.weights) - weights) / np.maximum(np.abs(weights), 1e-12)
+    bound_drift = np.abs(state.bounds - bounds) / span[:, None]
+    return float(max(weight_drift.max(), bound_drift.max()))
+
+  def _refresh_ranking(self, previous, state):
+    """
+    Apply the records that were added, changed or removed between two
+    dataset versions to the live ranking. When the reward weights or
+    bounds moved by more than `ranking_tolerance` every score changes, so
+    the ranking is dropped and rebuilt on the next request instead.
+    """
+    if self._model_drift(state) > self.ranking_tolerance:
+      self.ranking = None
+      return
+    updates = 0
+    for full_name in previous.records.keys() - state.records.keys():
+      self.ranking.remove(full_name)
+      updates += 1
+    for full_name, record in state.records.items():
+      if previous.records.get(full_name) != record:
+        self.ranking.upsert(record)
+        updates += 1
+    self.counters['ranking_updates'] += updates
+
+  def top(self, k=10):
+    """
+    The k best repositories by reward and by proximity to the optimum for
+    the default optimizer parameters, from the incrementally kept ranking.
+    The reward, bounds and optimum are those in effect when the ranking
+    was built.
+    """
+    params = {name: default for name, (_, default) in OPTIMIZER_PARAMS.items()}
+    while self.ranking is None:
+      state = self.state
+      position, value = self.optimize(state, params)
+      with self._lock:
+        if self.state is not state or self.ranking is not None:
+          # Reloaded or built by another request meanwhile.
+          continue
+        ranking = IncrementalRanking(position, state.bounds, state.reward)
+        for record in state.records.values():
+          ranking.upsert(record)
+        self.ranking, self._ranking_value = ranking, float(value)
+        self._ranking_model = (state.bounds.copy(), np.array(state.weights))
+    with self._lock:
+      ranking = self.ranking
+      return {
+        'optimal': dict(zip(METRICS, ranking.optimal_position.tolist())),
+        'optimal_reward': self._ranking_value,
+        'top_by_reward': ranking.top_by_reward(k),
+        'top_by_distance': ranking.top_by_distance(k),
+      }
+
+  def optimize(self, state, params):
+    """
+    Best (position, value) for `params`, from the cache when possible.
+    """
+    key = (state.bounds.tobytes(), state.weights) + tuple(params[name] for name in OPTIMIZER_PARAMS)
+    cacheable = params['seed'] is not None
+    with self._lock:
+      if cacheable and key in self.results:
+        self.results.move_to_end(key)
+        self.counters['cache_hits'] += 1
+        return self.results[key]
+      self.counters['cache_misses'] += 1
+    position, value = particle_swarm_optimization(len(state.bounds), state.bounds, state.reward, **params)
+    if cacheable:
+      with self._lock:
+        self.results[key] = (position, value)
+        while len(self.results) > self.cache_size:
+          self.results.popitem(last=False)
+    return position, value
+
+  def rank(self, params, k=10):
+    """
+    The optimum for `params` with the k best repositories by reward and by proximity to it.
+    """
+    state = self.state
+    position, value = self.optimize(state, params)
+    optimal = normalize_matrix(position, state.bounds)
+    by_reward = top_k_indices(state.rewards, k, largest=True)
+    reward_distances = np.sqrt(((state.normalized[by_reward] - optimal) ** 2).sum(axis=1))
+    closest, distances = state.index.nearest(optimal, k)
+    return {
+      'optimal': dict(zip(METRICS, np.asarray(position, dtype=float).tolist())),
+      'optimal_reward': float(value),
+      'top_by_reward': [state.repo_score(row, distance) for row, distance in zip(by_reward, reward_distances)],
+      'top_by_distance': [state.repo_score(row, distance) for row, distance in zip(closest, distances)],
+    }
+
+  def record(self, seconds, error=False):
+    with self._lock:
+      self.counters['requests'] += 1
+      self.counters['errors'] += int(error)
+      self.latencies.append(seconds)
+
+  def stats(self):
+    with self._lock:
+      latencies = np.array(self.latencies)
+      counters = dict(self.counters)
+    lookups = counters['cache_hits'] + counters['cache_misses']
+    return dict(
+      counters,
+      repositories=len(self.state.store),
+      cached_results=len(self.results),
+      cache_hit_rate=counters['cache_hits'] / lookups if lookups else 0.0,
+      latency_ms={
+        'p50': float(np.percentile(latencies, 50) * 1000) if len(latencies) else 0.0,
+        'p95': float(np.percentile(latencies, 95) * 1000) if len(latencies) else 0.0,
+        'max': float(latencies.max() * 1000) if len(latencies) else 0.0,
+      },
+    )
+
+
+def parse_params(query):
+  params = {}
+  for name, (kind, default) in OPTIMIZER_PARAMS.items():
+    value = query.get(name)
+    if name == 'seed' and value == 'none':
+      params[name] = None
+    else:
+      params[name] = default if value is None else kind(value)
+  return params
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+  protocol_version = 'HTTP/1.1'
+
+  def log_message(self, format, *args):
+    pass
+
+  def do_GET(self):
+    start = time.perf_counter()
+    service = self.server.service
+    url = urlparse(self.path)
+    query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+    try:
+      service.maybe_reload()
+      status, body = self.route(url.path.rstrip('/'), query)
+    except ValueError as e:
+      status, body = 400, {'error': str(e)}
+    except Exception as e:
+      status, body = 500, {'error': f"{type(e).__name__}: {e}"}
+    service.record(time.perf_counter() - start, error=status != 200)
+    self.send_json(status, body)
+
+  def route(self, path, query):
+    service = self.server.service
+    if path == '/rank':
+      k = int(query.get('k', 10))
+      if k < 1:
+        raise ValueError(f"k must be at least 1, got {k}")
+      return 200, service.rank(parse_params(query), k)
+    if path == '/top':
+      k = int(query.get('k', 10))
+      if k < 1:
+        raise ValueError(f"k must be at least 1, got {k}")
+      return 200, service.top(k)
+    if path == '/optimal':
+      params = parse_params(query)
+      position, value = service.optimize(service.state, params)
+      return 200, {'optimal': dict(zip(METRICS, np.asarray(position, dtype=float).tolist())), 'optimal_reward': float(value)}
+    if path == '/stats':
+      return 200, service.stats()
+    if path == '/health':
+      return 200, {'status': 'ok'}
+    return 404, {'error': 'Not Found'}
+
+  def send_json(self, status, body):
+    payload = json.dumps(body).encode('utf-8')
+    self.send_response(status)
+    self.send_header('Content-Type', 'application/json; charset=utf-8')
+    self.send_header('Content-Length', str(len(payload)))
+    self.end_headers()
+    self.wfile.write(payload)
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+  daemon_threads = True
+
+  def get_request(self):
+    request, _ = super().get_request()
+    return request, ('local', 0)
+
+
+def start_service(service, host='127.0.0.1', port=0, socket_path=None):
+  """
+  Serve `service` on a background thread; return (server, address).
+  """
+  if socket_path:
+    if os.path.exists(socket_path):
+      os.remove(socket_path)
+    server = ThreadingUnixHTTPServer(socket_path, ServiceHandler)
+    address = socket_path
+  else:
+    server = ThreadingHTTPServer((host, port), ServiceHandler)
+    server.daemon_threads = True
+    address = f"http://{host}:{server.server_address[1]}"
+  server.service = service
+  threading.Thread(target=server.serve_forever, daemon=True).start()
+  return server, address
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description='Serve repository rankings from a resident process')
+  parser.add_argument('--data', type=str, help='Dataset to serve (default: data/data.jsonl, else data/data.json)')
+  parser.add_argument('--host', type=str, default='127.0.0.1', help='Address to listen on (default: 127.0.0.1)')
+  parser.add_argument('--port', type=int, default=8080, help='Port to listen on (default: 8080)')
+  parser.add_argument('--socket', type=str, help='Listen on this Unix socket instead of TCP')
+  parser.add_argument('--cache-size', type=int, default=128, help='PSO results kept in memory (default: 128)')
+  parser.add_argument('--ranking-tolerance', type=float, default=0.05,
+                      help='Relative reward model drift that rebuilds the /top ranking on reload (default: 0.05)')
+
+  args = parser.parse_args()
+
+  service = ScoringService(args.data, cache_size=args.cache_size, ranking_tolerance=args.ranking_tolerance)
+  server, address = start_service(service, args.host, args.port, args.socket)
+  print(f"Serving {len(service.state.store)} repositories at {address}")
+  try:
+    threading.Event().wait()
+  except KeyboardInterrupt:
+    server.shutdown()
@@ -0,0 +1,324 @@
+import argparse
+import bisect
+import os
+import struct
+import time
+import numpy as np
+from dataset import NUMERIC_FIELDS, iter_records
+
+
+MAGIC = b'PSOSNAPS'
+VERSION = 1
+RECORD_HEADER = struct.Struct('<cI')
+NAMES, SNAPSHOT = b'N', b'S'
+
+
+def encode_varints(values):
+  """
+  LEB128-encode a vector of unsigned integers into one byte string.
+  """
+  values = np.asarray(values, dtype=np.uint64)
+  if len(values) == 0:
+    return b''
+  shifts = np.arange(10, dtype=np.uint64) * np.uint64(7)
+  groups = (values[:, None] >> shifts) & np.uint64(0x7f)
+  rest = values[:, None] >> (shifts + np.uint64(7))
+  length = np.maximum(1, (values[:, None] >> shifts > 0).sum(axis=1))
+  used = np.arange(10) < length[:, None]
+  groups = groups | np.where(rest > 0, np.uint64(0x80), np.uint64(0))
+  return groups[used].astype(np.uint8).tobytes()
+
+
+def decode_varints(buffer):
+  """
+  Decode a byte string of LEB128 varints into a uint64 vector.
+  """
+  data = np.frombuffer(buffer, dtype=np.uint8)
+  ends = np.flatnonzero(data < 0x80)
+  if len(ends) == 0:
+    return np.zeros(0, dtype=np.uint64)
+  # Bytes after the last complete varint belong to a cut-off one.
+  data = data[:ends[-1] + 1]
+  starts = np.concatenate([[0], ends[:-1] + 1])
+  position = np.arange(len(data)) - np.repeat(starts, ends - starts + 1)
+  parts = (data & 0x7f).astype(np.uint64) << (position.astype(np.uint64) * np.uint64(7))
+  return np.add.reduceat(parts, starts)
+
+
+def zigzag(values):
+  values = np.asarray(values, dtype=np.int64)
+  return ((values << 1) ^ (values >> 63)).astype(np.uint64)
+
+
+def unzigzag(values):
+  values = np.asarray(values, dtype=np.uint64)
+  return (values >> np.uint64(1)).astype(np.int64) ^ -(values & np.uint64(1)).astype(np.int64)
+
+
+class SnapshotStore:
+  """
+  Append-only history of the metrics of every repository, one snapshot per
+  collection timestamp.
+
+  The file is a magic/version header followed by records: a type byte, a
+  uint32 length and a payload. 'N' records add repository names to the
+  dictionary; 'S' records hold one snapshot as varints: timestamp, keyframe
+  flag, repository count, the byte length of the ids, the sorted repository
+  ids (delta-encoded), then one zigzag delta per metric against that
+  repository's previous values. Every `keyframe_interval` snapshots the
+  deltas restart from zero, so a time range decodes from the keyframe
+  before it instead of from the start of the file.
+
+  Snapshot offsets and timestamps (the time index) are read when the store
+  is opened; the repository index, mapping each repository to the snapshots
+  it appears in, is built from the id sections on first use.
+  """
+  def __init__(self, path, keyframe_interval=32):
+    self.path = path
+    self.keyframe_interval = keyframe_interval
+    self.names = []
+    self.ids = {}
+    self.offsets = []
+    self.timestamps = []
+    self.keyframes = []
+    self._repo_index = None
+    self._pairs = None
+    self._last = None
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+      with open(path, 'wb') as f:
+        f.write(MAGIC + struct.pack('<I', VERSION))
+    self._scan()
+
+  def __len__(self):
+    return len(self.offsets)
+
+  def _scan(self):
+    size = os.path.getsize(self.path)
+    with open(self.path, 'r+b') as f:
+      header = f.read(len(MAGIC) + 4)
+      if header[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{self.path} is not a snapshot store")
+      if struct.unpack('<I', header[len(MAGIC):])[0] != VERSION:
+        raise ValueError(f"{self.path} has an unsupported snapshot store version")
+      offset = len(header)
+      while True:
+        head = f.read(RECORD_HEADER.size)
+        if len(head) < RECORD_HEADER.size:
+          if head:
+            # A header cut short by a crash during append; drop it.
+            f.truncate(offset)
+          break
+        kind, length = RECORD_HEADER.unpack(head)
+        payload_offset = offset + RECORD_HEADER.size
+        if payload_offset + length > size:
+          # A record cut short by a crash during append; drop it.
+          f.truncate(offset)
+          break
+        if kind == NAMES:
+          for name in f.read(length).decode('utf-8').split('\n'):
+            self.ids[name] = len(self.names)
+            self.names.append(name)
+        else:
+          timestamp, keyframe = decode_varints(f.read(min(length, 20)))[:2]
+          self.offsets.append((payload_offset, length))
+          self.timestamps.append(int(timestamp))
+          if keyframe:
+            self.keyframes.append(len(self.offsets) - 1)
+          f.seek(payload_offset + length)
+        offset = payload_offset + length
+
+  def _payloads(self, snapshots):
+    with open(self.path, 'rb') as f:
+      for snapshot in snapshots:
+        offset, length = self.offsets[snapshot]
+        f.seek(offset)
+        yield f.read(length)
+
+  def _decode(self, payload, metrics=True):
+    """
+    Return (timestamp, keyframe, ids, deltas) of a snapshot payload.
+    """
+    # The four header varints take at most 40 bytes.
+    header = decode_varints(payload[:40])[:4]
+    timestamp, keyframe, count, ids_length = (int(value) for value in header)
+    start = len(encode_varints(header))
+    ids = np.cumsum(decode_varints(payload[start:start + ids_length]).astype(np.int64))
+    if not metrics:
+      return timestamp, keyframe, ids, None
+    deltas = unzigzag(decode_varints(payload[start + ids_length:])).reshape(count, len(NUMERIC_FIELDS))
+    return timestamp, keyframe, ids, deltas
+
+  def _keyframe_before(self, snapshot):
+    position = bisect.bisect_right(self.keyframes, snapshot)
+    return self.keyframes[position - 1] if position else 0
+
+  def _replay(self, first, last, ids=None):
+    """
+    Yield (snapshot, ids present, metric state of every repository) for
+    snapshots first..last-1, decoding from the keyframe before `first`.
+
+    With `ids`, only the snapshots that include one of those repositories
+    are decoded and yielded; their state is exact for those repositories,
+    since each one's deltas only depend on its own earlier snapshots.
+    """
+    begin = self._keyframe_before(first)
+    if ids is None:
+      snapshots = range(begin, last)
+    else:
+      snapshots = self._snapshots_of(ids, begin, last).tolist()
+    state = np.zeros((len(self.names), len(NUMERIC_FIELDS)), dtype=np.int64)
+    passed = 0
+    for snapshot, payload in zip(snapshots, self._payloads(snapshots)):
+      # Deltas restart at every keyframe, including the skipped ones.
+      keyframes = bisect.bisect_right(self.keyframes, snapshot)
+      if keyframes > passed:
+        state[:] = 0
+        passed = keyframes
+      _, _, present, deltas = self._decode(payload)
+      state[present] += deltas
+      if snapshot >= first:
+        yield snapshot, present, state
+
+  def append(self, records, timestamp=None):
+    """
+    Add a snapshot of `records` taken at `timestamp` (seconds since the
+    epoch, default now); snapshots must be appended in time order.
+    """
+    timestamp = int(time.time() if timestamp is None else timestamp)
+    if self.timestamps and timestamp < self.timestamps[-1]:
+      raise ValueError(f"Snapshot at {timestamp} is older than the last one at {self.timestamps[-1]}")
+    records = {record['full_name']: record for record in records}
+    new_names = [name for name in records if name not in self.ids]
+    new_ids = {name: len(self.names) + i for i, name in enumerate(new_names)}
+    names = self.names + new_names
+
+    keyframe = not self.keyframes or len(self.offsets) - self.keyframes[-1] >= self.keyframe_interval
+    if keyframe:
+      base = np.zeros((len(names), len(NUMERIC_FIELDS)), dtype=np.int64)
+    else:
+      if self._last is None:
+        self._last = next(state.copy() for _, _, state in self._replay(len(self.offsets) - 1, len(self.offsets)))
+      base = np.vstack([self._last, np.zeros((len(new_names), len(NUMERIC_FIELDS)), dtype=np.int64)])
+
+    ids = np.array(sorted(self.ids.get(name, new_ids.get(name)) for name in records), dtype=np.int64)
+    values = np.array([[int(records[names[i]].get(metric, 0) or 0) for metric in NUMERIC_FIELDS] for i in ids],
+                      dtype=np.int64).reshape(-1, len(NUMERIC_FIELDS))
+    id_bytes = encode_varints(np.diff(ids, prepend=0))
+    payload = (encode_varints([timestamp, int(keyframe), len(ids), len(id_bytes)]) + id_bytes
+               + encode_varints(zigzag((values - base[ids]).ravel())))
+
+    with open(self.path, 'ab') as f:
+      offset = f.tell()
+      if new_names:
+        blob = '\n'.join(new_names).encode('utf-8')
+        f.write(RECORD_HEADER.pack(NAMES, len(blob)) + blob)
+        offset += RECORD_HEADER.size + len(blob)
+      f.write(RECORD_HEADER.pack(SNAPSHOT, len(payload)) + payload)
+      f.flush()
+      os.fsync(f.fileno())
+
+    for name in new_names:
+      self.ids[name] = len(self.names)
+      self.names.append(name)
+    self.offsets.append((offset + RECORD_HEADER.size, len(payload)))
+    self.timestamps.append(timestamp)
+    if keyframe:
+      self.keyframes.append(len(self.offsets) - 1)
+      base[:] = 0
+    base[ids] = values
+    self._last = base
+    if self._repo_index is not None:
+      for i in ids:
+        self._repo_index.setdefault(int(i), []).append(len(self.offsets) - 1)
+    self._pairs = None
+
+  def _time_range(self, start=None, end=None):
+    timestamps = np.array(self.timestamps, dtype=np.int64)
+    first = 0 if start is None else int(np.searchsorted(timestamps, start, side='left'))
+    last = len(timestamps) if end is None else int(np.searchsorted(timestamps, end, side='right'))
+    return first, last
+
+  def repo_index(self):
+    """
+    Map of repository id to the indices of the snapshots that include it.
+    """
+    if self._repo_index is None:
+      index = {}
+      for snapshot, payload in enumerate(self._payloads(range(len(self.offsets)))):
+        for i in self._decode(payload, metrics=False)[2]:
+          index.setdefault(int(i), []).append(snapshot)
+      self._repo_index = index
+    return self._repo_index
+
+  def _index_pairs(self):
+    """
+    The repository index flattened into (ids, snapshots) arrays.
+    """
+    if self._pairs is None:
+      index = self.repo_index()
+      ids = np.repeat(np.fromiter(index, dtype=np.int64, count=len(index)),
+                      [len(snapshots) for snapshots in index.values()])
+      snapshots = np.fromiter((s for found in index.values() for s in found), dtype=np.int64, count=len(ids))
+      self._pairs = ids, snapshots
+    return self._pairs
+
+  def _snapshots_of(self, ids, first, last):
+    """
+    Sorted indices of the snapshots in first..last-1 that include any of `ids`.
+    """
+    pair_ids, pair_snapshots = self._index_pairs()
+    selected = np.isin(pair_ids, ids) & (pair_snapshots >= first) & (pair_snapshots < last)
+    return np.unique(pair_snapshots[selected])
+
+  def aligned(self, repos=None, start=None, end=None):
+    """
+    Return (names, timestamps, values) for the snapshots taken between
+    `start` and `end` (inclusive): values is a float (repos, time, metrics)
+    array, NaN where a repository is missing from a snapshot. `repos`
+    defaults to every repository seen in the range. Only the snapshots
+    that include one of the repositories are decoded.
+    """
+    first, last = self._time_range(start, end)
+    if repos is None:
+      pair_ids, pair_snapshots = self._index_pairs()
+      ids = np.unique(pair_ids[(pair_snapshots >= first) & (pair_snapshots < last)])
+    else:
+      ids = np.array([self.ids[name] for name in repos], dtype=np.int64)
+    values = np.full((len(ids), max(last - first, 0), len(NUMERIC_FIELDS)), np.nan)
+    if last > first and len(ids):
+      lookup = np.full(len(self.names), -1, dtype=np.int64)
+      lookup[ids] = np.arange(len(ids))
+      for snapshot, present, state in self._replay(first, last, ids):
+        rows = lookup[present]
+        selected = rows >= 0
+        values[rows[selected], snapshot - first] = state[present[selected]]
+    return [self.names[i] for i in ids], np.array(self.timestamps[first:last], dtype=np.int64), values
+
+  def history(self, full_name, start=None, end=None):
+    """
+    Return (timestamps, values) of the snapshots that include one
+    repository, decoding only those snapshots.
+    """
+    first, last = self._time_range(start, end)
+    i = self.ids[full_name]
+    timestamps, values = [], []
+    for snapshot, _, state in self._replay(first, last, [i]):
+      timestamps.append(self.timestamps[snapshot])
+      values.append(state[i].astype(float))
+    return np.array(timestamps, dtype=np.int64), np.array(values).reshape(-1, len(NUMERIC_FIELDS))
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description='Record and inspect repository metric snapshots')
+  parser.add_argument('command', choices=['append', 'info'], help='append a dataset as a snapshot, or summarize the store')
+  parser.add_argument('source', nargs='?', default='data/data.jsonl', help='Dataset to append (default: data/data.jsonl)')
+  parser.add_argument('--store', type=str, default='data/snapshots.bin', help='Snapshot store (default: data/snapshots.bin)')
+  parser.add_argument('--timestamp', type=int, help='Snapshot time in seconds since the epoch (default: now)')
+
+  args = parser.parse_args()
+
+  store = SnapshotStore(args.store)
+  if args.command == 'append':
+    store.append(iter_records(args.source), args.timestamp)
+  size = os.path.getsize(args.store)
+  print(f"{args.store}: {len(store)} snapshots of {len(store.names)} repositories, {size} bytes")
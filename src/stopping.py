@@ -0,0 +1,75 @@
+import time
+import numpy as np
+
+
+class StoppingCriteria:
+  """
+  Combinable stopping rules for particle_swarm_optimization.
+
+  Every rule is off unless its argument is given; the first one to fire
+  stops the run and its name is reported as the stop reason:
+
+  - 'no_improvement': the global best value (every objective of it, in a
+    multi-objective run) has not moved by more than `min_improvement` for
+    `patience` iterations
+  - 'diameter': the swarm's bounding box, measured in bounds-normalized
+    coordinates, has a diagonal below `diameter_tol`
+  - 'velocity': the mean particle speed, in bounds-normalized coordinates,
+    is below `velocity_tol` (both geometric rules skip the initial swarm)
+  - 'max_evaluations': another iteration, costing as many fitness
+    evaluations as the last one did (the whole swarm before the first),
+    would exceed `max_evaluations`
+  - 'time_limit': `time_limit` seconds of wall-clock time have passed
+  """
+  def __init__(self, patience=None, min_improvement=0.0, diameter_tol=None, velocity_tol=None,
+               max_evaluations=None, time_limit=None):
+    self.patience = patience
+    self.min_improvement = min_improvement
+    self.diameter_tol = diameter_tol
+    self.velocity_tol = velocity_tol
+    self.max_evaluations = max_evaluations
+    self.time_limit = time_limit
+
+  def start(self, swarm):
+    """
+    Reset the per-run state; call once before the first iteration.
+    """
+    self._started = time.perf_counter()
+    self._best_value = swarm.best_values[swarm.global_best_index()]
+    self._stale = 0
+    self._checks = 0
+    self._evaluations = swarm.evaluations
+    self._step_cost = swarm.num_particles
+
+  def elapsed(self):
+    return time.perf_counter() - self._started
+
+  def check(self, swarm):
+    """
+    Return the name of the first rule that fires, or None to keep going.
+    """
+    self._checks += 1
+    if swarm.evaluations > self._evaluations:
+      # With a surrogate only the screened particles are evaluated.
+      self._step_cost = swarm.evaluations - self._evaluations
+    self._evaluations = swarm.evaluations
+    best_value = swarm.best_values[swarm.global_best_index()]
+    if np.any(np.abs(best_value - self._best_value) > self.min_improvement):
+      self._best_value = best_value
+      self._stale = 0
+    else:
+      self._stale += 1
+
+    if self.patience is not None and self._stale > self.patience:
+      return 'no_improvement'
+    # The initial velocities carry no information about convergence.
+    if self._checks > 1:
+      if self.diameter_tol is not None and swarm.diameter() < self.diameter_tol:
+        return 'diameter'
+      if self.velocity_tol is not None and swarm.mean_speed() < self.velocity_tol:
+        return 'velocity'
+    if self.max_evaluations is not None and swarm.evaluations + self._step_cost > self.max_evaluations:
+      return 'max_evaluations'
+    if self.time_limit is not None and self.elapsed() >= self.time_limit:
+      return 'time_limit'
+    return None
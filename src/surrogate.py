@@ -0,0 +1,162 @@
+from collections import OrderedDict
+import numpy as np
+from algorithm import batch_reward
+
+
+class EvaluationCache:
+  """
+  LRU cache in front of an expensive reward, keyed on positions quantized
+  to `resolution` of each dimension's bounds width.
+
+  Follows the batched reward protocol, so it can be passed anywhere a
+  reward function is expected. `misses` counts true evaluations.
+  """
+  def __init__(self, reward_function, bounds, resolution=1e-9, max_size=100000):
+    bounds = np.asarray(bounds, dtype=float)
+    self.reward_function = reward_function
+    self._batch_reward = batch_reward(reward_function)
+    self.low = bounds[:, 0]
+    width = bounds[:, 1] - bounds[:, 0]
+    self.step = np.where(width > 0, width, 1.0) * resolution
+    self.max_size = max_size
+    self.entries = OrderedDict()
+    self.hits = 0
+    self.misses = 0
+
+  def keys(self, X):
+    cells = np.floor((np.asarray(X, dtype=float) - self.low) / self.step + 0.5).astype(np.int64)
+    return [row.tobytes() for row in cells]
+
+  def batch(self, X):
+    X = np.asarray(X, dtype=float)
+    keys = self.keys(X)
+    values = np.empty(len(X))
+    pending = {}
+    for i, key in enumerate(keys):
+      if key in self.entries:
+        self.entries.move_to_end(key)
+        values[i] = self.entries[key]
+        self.hits += 1
+      else:
+        pending.setdefault(key, []).append(i)
+    if pending:
+      first = [rows[0] for rows in pending.values()]
+      fresh = np.asarray(self._batch_reward(X[first]), dtype=float)
+      self.misses += len(first)
+      for (key, rows), value in zip(pending.items(), fresh):
+        values[rows] = value
+        self.entries[key] = value
+        self.hits += len(rows) - 1
+      while len(self.entries) > self.max_size:
+        self.entries.popitem(last=False)
+    return values
+
+  def __call__(self, x):
+    return float(self.batch(np.asarray(x, dtype=float)[None, :])[0])
+
+  def stats(self):
+    total = self.hits + self.misses
+    return {'hits': self.hits, 'misses': self.misses, 'size': len(self.entries),
+            'hit_rate': self.hits / total if total else 0.0}
+
+
+def _squared_distances(A, B):
+  squared = (A ** 2).sum(axis=1)[:, None] + (B ** 2).sum(axis=1)[None, :] - 2.0 * A @ B.T
+  return np.maximum(squared, 0.0)
+
+
+def _cubic_kernel(A, B):
+  return _squared_distances(A, B) ** 1.5
+
+
+class SurrogateModel:
+  """
+  Cubic radial-basis-function model of the reward, fitted on the most recent
+  `archive_size` true evaluations, used to pre-screen candidate positions.
+
+  Once `min_samples` evaluations are known, screen keeps only the
+  `screen_fraction` of candidates with the best score (at least one); the
+  rest are not evaluated. The score is the predicted value plus an
+  exploration bonus: `exploration` times the spread of the archived
+  rewards, times the candidate's normalized distance to the nearest
+  archived position. Without the bonus the swarm only samples where the
+  model is already confident and stalls early on multimodal rewards.
+  """
+  def __init__(self, bounds, screen_fraction=0.1, archive_size=256, min_samples=None, exploration=0.5):
+    bounds = np.asarray(bounds, dtype=float)
+    self.low = bounds[:, 0]
+    width = bounds[:, 1] - bounds[:, 0]
+    self.width = np.where(width > 0, width, 1.0)
+    self.screen_fraction = screen_fraction
+    self.exploration = exploration
+    self.archive_size = archive_size
+    self.min_samples = min_samples or 2 * (len(bounds) + 1)
+    self.X = np.empty((0, len(bounds)))
+    self.y = np.empty(0)
+    self.screened = 0
+    self._weights = None
+
+  def _scaled(self, X):
+    return (np.asarray(X, dtype=float) - self.low) / self.width
+
+  @property
+  def ready(self):
+    return len(self.y) >= self.min_samples
+
+  def add(self, X, y):
+    """
+    Record true evaluations; the oldest are dropped beyond `archive_size`.
+    Positions already in the archive are skipped, which keeps the fit
+    well-posed when particles pile up on the bounds.
+    """
+    Z, y = self._scaled(X), np.asarray(y, dtype=float)
+    _, first = np.unique(Z, axis=0, return_index=True)
+    first = np.sort(first)
+    Z, y = Z[first], y[first]
+    if len(self.y):
+      fresh = _squared_distances(Z, self.X).min(axis=1) > 1e-18
+      Z, y = Z[fresh], y[fresh]
+    self.X = np.concatenate([self.X, Z])[-self.archive_size:]
+    self.y = np.concatenate([self.y, y])[-self.archive_size:]
+    self._weights = None
+
+  def _fit(self):
+    n, d = self.X.shape
+    tail = np.hstack([np.ones((n, 1)), self.X])
+    system = np.zeros((n + d + 1, n + d + 1))
+    system[:n, :n] = _cubic_kernel(self.X, self.X)
+    system[:n, n:] = tail
+    system[n:, :n] = tail.T
+    system[:n, :n] += np.eye(n) * 1e-9
+    rhs = np.concatenate([self.y, np.zeros(d + 1)])
+    try:
+      self._weights = np.linalg.solve(system, rhs)
+    except np.linalg.LinAlgError:
+      self._weights = np.linalg.lstsq(system, rhs, rcond=None)[0]
+
+  def predict(self, X):
+    """
+    Predicted reward for every row of an (N, D) matrix.
+    """
+    if self._weights is None:
+      self._fit()
+    Z = self._scaled(X)
+    n = len(self.y)
+    phi = _cubic_kernel(Z, self.X)
+    return phi @ self._weights[:n] + self._weights[n] + Z @ self._weights[n + 1:]
+
+  def screen(self, X, sign=1.0):
+    """
+    Indices of the rows of X worth a true evaluation, in row order;
+    `sign` is -1 when minimizing.
+    """
+    if not self.ready:
+      return np.arange(len(X))
+    keep = max(1, int(np.ceil(self.screen_fraction * len(X))))
+    score = sign * self.predict(X)
+    if self.exploration:
+      nearest = np.sqrt(_squared_distances(self._scaled(X), self.X).min(axis=1) / self.X.shape[1])
+      score = score + self.exploration * self.y.std() * nearest
+    chosen = np.sort(np.argsort(-score, kind='stable')[:keep])
+    self.screened += len(X) - keep
+    return chosen
@@ -0,0 +1,198 @@
+import argparse
+import csv
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from algorithm import batch_reward, particle_swarm_optimization
+from application import get_min_max_metrics, reward_function
+
+
+RESULT_FIELDS = ['w', 'c1', 'c2', 'num_particles', 'mean_best_value', 'std_best_value', 'evaluations',
+                 'seconds', 'improvement_per_evaluation', 'improvement_per_second', 'rank_per_second']
+
+
+def grid_search_space(w=(0.3, 0.5, 0.7, 0.9), c1=(0.5, 1.5, 2.5), c2=(0.5, 1.5, 2.5), num_particles=(20, 50, 100)):
+  """
+  Every combination of the given hyperparameter values.
+  """
+  return [{'w': a, 'c1': b, 'c2': c, 'num_particles': n} for a, b, c, n in itertools.product(w, c1, c2, num_particles)]
+
+
+def random_search_space(count, w=(0.2, 0.9), c1=(0.5, 2.5), c2=(0.5, 2.5), num_particles=(10, 100), seed=None):
+  """
+  `count` configurations drawn uniformly from the given (low, high) ranges.
+  """
+  rng = np.random.default_rng(seed)
+  return [{
+    'w': float(rng.uniform(*w)),
+    'c1': float(rng.uniform(*c1)),
+    'c2': float(rng.uniform(*c2)),
+    'num_particles': int(rng.integers(num_particles[0], num_particles[1] + 1)),
+  } for _ in range(count)]
+
+
+def _run_batched(configs, num_particles, dim, bounds, batch, max_iter, rng, maximize=True):
+  """
+  Run every config in `configs` (all sharing `num_particles`) as one
+  (configs, particles, dims) tensor computation.
+
+  All configs draw the same random numbers, in the same order as Swarm,
+  so each row matches particle_swarm_optimization seeded with `rng`'s seed
+  (global-best topology). Returns the (configs,) vector of final best values.
+  """
+  count = len(configs)
+  w = np.array([config['w'] for config in configs]).reshape(count, 1, 1)
+  c1 = np.array([config['c1'] for config in configs]).reshape(count, 1, 1)
+  c2 = np.array([config['c2'] for config in configs]).reshape(count, 1, 1)
+  low, high = bounds[:, 0], bounds[:, 1]
+  rows = np.arange(count)
+  sign = 1.0 if maximize else -1.0
+
+  def evaluate(positions):
+    return np.asarray(batch(positions.reshape(-1, dim)), dtype=float).reshape(count, num_particles)
+
+  u = rng.random((num_particles, 2, dim))
+  positions = np.broadcast_to(low + (high - low) * u[:, 0], (count, num_particles, dim)).copy()
+  velocities = np.broadcast_to(-1.0 + 2.0 * u[:, 1], (count, num_particles, dim)).copy()
+  best_positions = positions.copy()
+  best_values = evaluate(positions)
+  global_best = best_positions[rows, np.argmax(sign * best_values, axis=1)]
+
+  for _ in range(max_iter):
+    r = rng.random((num_particles, 2, dim))
+    velocities = w * velocities + c1 * r[:, 0] * (best_positions - positions) + c2 * r[:, 1] * (global_best[:, None, :] - positions)
+    positions = np.clip(positions + velocities, low, high)
+    values = evaluate(positions)
+    improved = sign * values > sign * best_values
+    best_values = np.where(improved, values, best_values)
+    best_positions = np.where(improved[..., None], positions, best_positions)
+    global_best = best_positions[rows, np.argmax(sign * best_values, axis=1)]
+
+  return np.asarray(batch(global_best), dtype=float)
+
+
+def _run_single(args):
+  config, dim, bounds, reward, max_iter, seed, maximize = args
+  start = time.perf_counter()
+  _, best_value = particle_swarm_optimization(dim, bounds, reward, num_particles=config['num_particles'], max_iter=max_iter,
+                                              w=config['w'], c1=config['c1'], c2=config['c2'], seed=seed,
+                                              mode='maximize' if maximize else 'minimize')
+  return best_value, time.perf_counter() - start
+
+
+def reference_value(bounds, batch, seed=0, samples=1000):
+  """
+  Mean reward of uniformly random positions within `bounds`: the baseline
+  that sweep improvements are measured against.
+  """
+  rng = np.random.default_rng(seed)
+  low, high = bounds[:, 0], bounds[:, 1]
+  return float(np.mean(batch(low + (high - low) * rng.random((samples, len(bounds))))))
+
+
+def run_sweep(configs, dim, bounds, reward, max_iter=100, repeats=5, seed=0, mode='batched', workers=None, maximize=True):
+  """
+  Evaluate every configuration `repeats` times and return result rows ranked
+  by improvement per fitness evaluation, best first, ties going to the
+  cheaper configuration. The improvement is how far the mean best value
+  beats reference_value in the optimized direction, so it favours cheap
+  configurations without rewarding expensive ones in either direction.
+  `rank_per_second` gives each row's place when ranked by improvement per
+  second of run time instead.
+
+  Repeat r of every configuration uses the same random stream (common random
+  numbers), so differences between configurations are not seed noise.
+  `mode='batched'` runs configurations with the same swarm size as one
+  tensor computation and charges each an equal share of the time;
+  `mode='process'` runs each (configuration, repeat) on a process pool.
+  """
+  bounds = np.asarray(bounds, dtype=float)
+  seeds = np.random.SeedSequence(seed).spawn(repeats)
+  values = np.zeros((len(configs), repeats))
+  seconds = np.zeros(len(configs))
+
+  if mode == 'batched':
+    batch = batch_reward(reward)
+    groups = {}
+    for i, config in enumerate(configs):
+      groups.setdefault(config['num_particles'], []).append(i)
+    for num_particles, members in groups.items():
+      for r, seed_seq in enumerate(seeds):
+        start = time.perf_counter()
+        values[members, r] = _run_batched([configs[i] for i in members], num_particles, dim, bounds, batch, max_iter,
+                                          np.random.default_rng(seed_seq), maximize)
+        seconds[members] += (time.perf_counter() - start) / len(members)
+  elif mode == 'process':
+    jobs = [(config, dim, bounds, reward, max_iter, seed_seq, maximize) for config in configs for seed_seq in seeds]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+      for job, (best_value, elapsed) in enumerate(executor.map(_run_single, jobs)):
+        values[job // repeats, job % repeats] = best_value
+        seconds[job // repeats] += elapsed
+  else:
+    raise ValueError(f"Unknown sweep mode '{mode}'")
+
+  reference = reference_value(bounds, batch_reward(reward), seed)
+  sign = 1.0 if maximize else -1.0
+  results = []
+  for i, config in enumerate(configs):
+    evaluations = config['num_particles'] * (max_iter + 1) * repeats
+    mean_value = float(values[i].mean())
+    improvement = sign * (mean_value - reference)
+    results.append(dict(
+      config,
+      mean_best_value=mean_value,
+      std_best_value=float(values[i].std()),
+      evaluations=evaluations,
+      seconds=float(seconds[i]),
+      improvement_per_evaluation=improvement / evaluations * repeats,
+      improvement_per_second=float(improvement / seconds[i] * repeats) if seconds[i] > 0 else float('inf'),
+    ))
+  by_second = sorted(range(len(results)), key=lambda i: (-results[i]['improvement_per_second'], results[i]['seconds']))
+  for rank, i in enumerate(by_second, 1):
+    results[i]['rank_per_second'] = rank
+  results.sort(key=lambda result: (-result['improvement_per_evaluation'], result['evaluations']))
+  return results
+
+
+def write_results(results, file_path):
+  directory = os.path.dirname(file_path)
+  if directory:
+    os.makedirs(directory, exist_ok=True)
+  with open(file_path, 'w', encoding='utf-8', newline='') as f:
+    writer = csv.DictWriter(f, fieldnames=['rank'] + RESULT_FIELDS)
+    writer.writeheader()
+    for rank, result in enumerate(results, 1):
+      writer.writerow(dict(result, rank=rank))
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description='Sweep PSO hyperparameters on the repository reward')
+  parser.add_argument('--random', type=int, help='Sample this many random configurations instead of the default grid')
+  parser.add_argument('--repeats', type=int, default=5, help='Runs per configuration (default: 5)')
+  parser.add_argument('--max-iter', type=int, default=100, help='Iterations per run (default: 100)')
+  parser.add_argument('--mode', choices=['batched', 'process'], default='batched', help='How configurations are run (default: batched)')
+  parser.add_argument('--workers', type=int, help='Process pool size for --mode process')
+  parser.add_argument('--seed', type=int, default=0, help='Seed for the common random numbers (default: 0)')
+  parser.add_argument('--output', type=str, default='data/sweep.csv', help='Results table (default: data/sweep.csv)')
+
+  args = parser.parse_args()
+
+  bounds = get_min_max_metrics()
+  configs = random_search_space(args.random, seed=args.seed) if args.random else grid_search_space()
+  results = run_sweep(configs, len(bounds), bounds, reward_function, max_iter=args.max_iter, repeats=args.repeats,
+                      seed=args.seed, mode=args.mode, workers=args.workers)
+  write_results(results, args.output)
+
+  print(f"Swept {len(configs)} configurations x {args.repeats} repeats; results saved to {args.output}")
+  def describe(result):
+    return f"w={result['w']:.2f} c1={result['c1']:.2f} c2={result['c2']:.2f} particles={result['num_particles']}"
+  print("Best improvement per evaluation:")
+  for rank, result in enumerate(results[:5], 1):
+    print(f"{rank}. {describe(result)}: best={result['mean_best_value']:.2f}, "
+          f"per evaluation={result['improvement_per_evaluation']:.4f}")
+  print("Best improvement per second:")
+  for result in sorted(results, key=lambda result: result['rank_per_second'])[:5]:
+    print(f"{result['rank_per_second']}. {describe(result)}: best={result['mean_best_value']:.2f}, "
+          f"per second={result['improvement_per_second']:.2f}")
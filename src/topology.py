@@ -0,0 +1,50 @@
+import numpy as np
+
+
+TOPOLOGIES = ['global', 'ring', 'von_neumann', 'random']
+
+
+def _ring(num_particles):
+  i = np.arange(num_particles)
+  return np.stack([(i - 1) % num_particles, i, (i + 1) % num_particles], axis=1)
+
+
+def _von_neumann(num_particles):
+  rows = max(r for r in range(1, int(np.sqrt(num_particles)) + 1) if num_particles % r == 0)
+  cols = num_particles // rows
+  i = np.arange(num_particles)
+  r, c = i // cols, i % cols
+  return np.stack([
+    i,
+    ((r - 1) % rows) * cols + c,
+    ((r + 1) % rows) * cols + c,
+    r * cols + (c - 1) % cols,
+    r * cols + (c + 1) % cols,
+  ], axis=1)
+
+
+def _random(num_particles, rng, k):
+  draw = rng.integers if rng is not None else np.random.randint
+  informants = draw(0, num_particles, size=(num_particles, k))
+  return np.concatenate([np.arange(num_particles)[:, None], informants], axis=1)
+
+
+def neighborhood_indices(topology, num_particles, rng=None, k=3):
+  """
+  Return an (N, K) array whose row i lists the particles i learns from
+  (itself included), or None for the global-best topology.
+
+  'ring' links each particle to its two index neighbours; 'von_neumann'
+  lays the swarm on a torus grid as close to square as the swarm size
+  allows and links the four grid neighbours; 'random' gives each particle
+  `k` informants drawn once from `rng` (or the global np.random state).
+  """
+  if topology == 'global':
+    return None
+  if topology == 'ring':
+    return _ring(num_particles)
+  if topology == 'von_neumann':
+    return _von_neumann(num_particles)
+  if topology == 'random':
+    return _random(num_particles, rng, k)
+  raise ValueError(f"Unknown topology '{topology}'; expected one of {', '.join(TOPOLOGIES)}")
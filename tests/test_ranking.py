@@ -0,0 +1,42 @@
+import numpy as np
+from application import get_min_max_metrics, reward_function
+from main import METRICS
+from ranking import IncrementalRanking, check_against_full_recompute
+
+
+def random_operations(ranking, count, rng, pool=200):
+  """
+  Apply `count` random inserts, updates and deletes drawn from `pool` names,
+  with coarse integer metrics so that ties are common.
+  """
+  bounds = ranking.bounds
+  for _ in range(count):
+    full_name = f"owner/repo{rng.integers(pool)}"
+    if full_name in ranking.entries and rng.random() < 0.3:
+      ranking.remove(full_name)
+    else:
+      levels = rng.integers(0, 4, len(METRICS))
+      record = {metric: int(low + (high - low) * level / 3) for metric, level, (low, high) in zip(METRICS, levels, bounds)}
+      record.update(name=full_name.split('/')[1], full_name=full_name)
+      ranking.upsert(record)
+    yield
+
+
+def test_incremental_top_k_matches_full_recompute():
+  rng = np.random.default_rng(0)
+  bounds = get_min_max_metrics()
+  ranking = IncrementalRanking(bounds[:, 1] * rng.random(len(bounds)), bounds, reward_function)
+  for step, _ in enumerate(random_operations(ranking, 2000, rng), 1):
+    if step % 250 == 0:
+      ranking.set_optimal(bounds[:, 1] * rng.random(len(bounds)))
+    if step % 25 == 0:
+      assert check_against_full_recompute(ranking, k=10) == [], f"after {step} operations"
+
+
+def test_small_and_empty_rankings():
+  rng = np.random.default_rng(1)
+  bounds = get_min_max_metrics()
+  ranking = IncrementalRanking(bounds[:, 1] * rng.random(len(bounds)), bounds, reward_function)
+  assert ranking.top_by_reward(5) == [] and ranking.top_by_distance(5) == []
+  for _ in random_operations(ranking, 3, rng, pool=3):
+    assert check_against_full_recompute(ranking, k=5) == []